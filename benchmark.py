@@ -0,0 +1,260 @@
+import argparse
+import concurrent.futures
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+from collections import Counter, defaultdict
+from profiling import CountingApi
+from simulator_backend import BACKENDS, add_sumo_tools_path, get_backend
+
+def timed(timings, name, func):
+    """Wrap func so its cumulative wall time and call count land in timings[name]"""
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            entry = timings[name]
+            entry["seconds"] += time.perf_counter() - start
+            entry["calls"] += 1
+    return wrapper
+
+def peak_rss_kb():
+    """Peak resident set size of this process and of finished children (SUMO), in KiB"""
+    scale = 1 if sys.platform != "darwin" else 1 / 1024  # macOS reports bytes
+    return {
+        "self": int(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale),
+        "children": int(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * scale),
+    }
+
+def prepare_grid_scenario(rows, cols, directory, end=900, period=None):
+    """Build (or reuse) a generated grid network with random trips and its config"""
+    from create_network import build_network, write_grid_files
+
+    os.makedirs(directory, exist_ok=True)
+    name = f"grid_{rows}x{cols}"
+    base = os.path.join(directory, name)
+    net_file, route_file, config_file = base + ".net.xml", base + ".rou.xml", base + ".sumocfg"
+
+    write_grid_files(rows, cols, base + ".nod.xml", base + ".edg.xml")
+    if not build_network(base + ".nod.xml", base + ".edg.xml", net_file):
+        raise RuntimeError(f"netconvert failed for {name}")
+
+    if not os.path.exists(route_file):
+        random_trips = os.path.join(os.environ['SUMO_HOME'], 'tools', 'randomTrips.py')
+        # Scale demand with the number of fringe edges
+        period = period or max(0.1, 4.0 / (rows + cols))
+        subprocess.run([
+            sys.executable, random_trips, "-n", net_file, "-r", route_file,
+            "-o", base + ".trips.xml", "-e", str(end), "-p", str(period),
+            "--fringe-factor", "100", "--seed", "42",
+        ], check=True, capture_output=True)
+
+    with open(config_file, 'w') as f:
+        f.write(f'''<?xml version="1.0" encoding="UTF-8"?>
+<configuration>
+    <input>
+        <net-file value="{os.path.basename(net_file)}"/>
+        <route-files value="{os.path.basename(route_file)}"/>
+    </input>
+    <time>
+        <begin value="0"/>
+        <end value="{end}"/>
+    </time>
+</configuration>''')
+    return name, config_file
+
+def measure_metric_access(controller, samples=20, steps_between=10):
+    """Compare per-call metric getters against the subscription collector"""
+    sim = controller.sim
+    tls_ids = list(controller.green_times)
+    result = {"legacy": {"seconds": 0.0, "calls": 0}, "subscription": {"seconds": 0.0, "calls": 0}}
+
+    for _ in range(samples):
+        for _ in range(steps_between):
+            sim.simulationStep()
+
+        before, start = sim.total(), time.perf_counter()
+        for tls_id in tls_ids:
+            controller.get_intersection_waiting_time(tls_id)
+            controller.get_intersection_vehicle_count(tls_id)
+        result["legacy"]["seconds"] += time.perf_counter() - start
+        result["legacy"]["calls"] += sim.total() - before
+
+        before, start = sim.total(), time.perf_counter()
+        controller.collector.collect()
+        result["subscription"]["seconds"] += time.perf_counter() - start
+        result["subscription"]["calls"] += sim.total() - before
+
+    for entry in result.values():
+        entry["seconds_per_sample"] = entry["seconds"] / samples
+        entry["calls_per_sample"] = entry["calls"] / samples
+    return result
+
+def run_scenario(name, config_file, backend_name, iterations, evaluation_steps, solver_method):
+    """Benchmark one scenario; runs in a fresh process so peak RSS is per scenario"""
+    from cooperative_control import CooperativeTrafficControl
+    from game_solver import GreenTimeGame
+    from metrics_collector import MetricsCollector
+
+    backend = get_backend(backend_name)
+    report = {"scenario": name, "config": config_file, "backend": backend.name}
+    started = time.perf_counter()
+    try:
+        backend.start(["-c", config_file, "--no-step-log", "--no-warnings"])
+        report["startup_seconds"] = time.perf_counter() - started
+
+        counting = CountingApi(backend.api)
+        controller = CooperativeTrafficControl(backend)
+        controller.sim = counting
+        controller.verbose = False
+
+        tls_ids = list(counting.trafficlight.getIDList())
+        if set(tls_ids) != {"A", "B"}:
+            controller.solver = GreenTimeGame()
+            controller.method = solver_method
+            controller.discover_intersections()
+        report["intersections"] = len(controller.green_times)
+
+        controller.collector = MetricsCollector(list(controller.green_times), api=counting)
+        controller.collector.subscribe()
+
+        timings = defaultdict(lambda: {"seconds": 0.0, "calls": 0})
+        original_collect = controller.collector.collect
+        collect = timed(timings, "collect_metrics", original_collect)
+        legacy = {"seconds": 0.0, "calls": 0, "traci_calls": 0}
+        legacy_calls = Counter()
+
+        def collect_and_legacy():
+            # The legacy getter runs at the same sample points as the collector;
+            # its time and TraCI calls are kept out of the loop totals
+            metrics = collect()
+            before, start = counting.calls.copy(), time.perf_counter()
+            for tls_id in controller.green_times:
+                controller.get_intersection_waiting_time(tls_id)
+            legacy["seconds"] += time.perf_counter() - start
+            legacy["calls"] += 1
+            legacy_calls.update(counting.calls - before)
+            return metrics
+
+        controller.collector.collect = collect_and_legacy
+        controller.cooperative_decision = timed(timings, "cooperative_decision", controller.cooperative_decision)
+        controller.solve_green_times = timed(timings, "solve_green_times", controller.solve_green_times)
+        controller.set_traffic_light_phases = timed(
+            timings, "set_traffic_light_phases", controller.set_traffic_light_phases)
+        step_timings = {"seconds": 0.0, "calls": 0}
+        counting.simulationStep = timed({"step": step_timings}, "step", counting.simulationStep)
+
+        counting.calls.clear()
+        loop_start = time.perf_counter()
+        for _ in range(iterations):
+            if controller.solver is None:
+                averages = controller.evaluate_plan(evaluation_steps=evaluation_steps)
+                controller.cooperative_decision(
+                    averages["A"]["wait"], averages["B"]["wait"],
+                    averages["A"]["vehicles"], averages["B"]["vehicles"])
+            else:
+                averages = controller.evaluate_plan(evaluation_steps=evaluation_steps)
+                controller.green_times = controller.solve_green_times(averages)
+        loop_seconds = time.perf_counter() - loop_start - legacy["seconds"]
+        controller.collector.collect = original_collect  # measure_metric_access times its own calls
+        steps = iterations * evaluation_steps
+        loop_calls = counting.calls - legacy_calls
+        traci_calls = sum(loop_calls.values())
+        legacy["traci_calls"] = sum(legacy_calls.values())
+        timings["get_intersection_waiting_time"] = legacy
+
+        report.update({
+            "steps": steps,
+            "loop_seconds": loop_seconds,
+            "steps_per_second": steps / loop_seconds if loop_seconds else 0,
+            "simulation_step_seconds": step_timings["seconds"],
+            "traci_calls": traci_calls,
+            "traci_calls_per_step": traci_calls / steps if steps else 0,
+            "top_traci_calls": dict(loop_calls.most_common(10)),
+            "timings": dict(timings),
+            "metric_access": measure_metric_access(controller),
+        })
+    except Exception as e:
+        report["error"] = str(e)
+    finally:
+        backend.close()
+
+    report["peak_rss_kb"] = peak_rss_kb()
+    return report
+
+def compare(previous, current, keys=("steps_per_second", "traci_calls_per_step", "loop_seconds")):
+    """Print relative changes between two benchmark result files"""
+    old = {report["scenario"]: report for report in previous["scenarios"]}
+    for report in current["scenarios"]:
+        before = old.get(report["scenario"])
+        if before is None or "error" in report or "error" in before:
+            continue
+        changes = []
+        for key in keys:
+            if before.get(key):
+                changes.append(f"{key} {(report[key] - before[key]) / before[key]:+.1%}")
+        print(f"📈 {report['scenario']}: " + ", ".join(changes))
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the cooperative control loop")
+    parser.add_argument("--backend", choices=[b for b in BACKENDS if b != "sumo-gui"], default="sumo",
+                        help="headless simulator backend")
+    parser.add_argument("--configs", nargs="*", default=["generated_config.sumocfg"],
+                        help="bundled scenarios to run")
+    parser.add_argument("--grids", nargs="*", default=["3x3", "5x5"],
+                        help="generated grid networks to run, as RxC")
+    parser.add_argument("--iterations", type=int, default=2, help="control iterations per scenario")
+    parser.add_argument("--evaluation-steps", type=int, default=300, help="simulated seconds per iteration")
+    parser.add_argument("--solver", default="best_response", help="solver method for N-intersection networks")
+    parser.add_argument("--work-dir", default=".bench", help="directory for generated scenarios")
+    parser.add_argument("--output", default="benchmark_results.json", help="JSON results file")
+    parser.add_argument("--compare", help="previous JSON results to compare against")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    if not add_sumo_tools_path():
+        print("❌ Please set SUMO_HOME environment variable")
+        return
+
+    scenarios = [(os.path.splitext(os.path.basename(c))[0], c) for c in args.configs]
+    for grid in args.grids:
+        rows, cols = (int(n) for n in grid.lower().split("x"))
+        scenarios.append(prepare_grid_scenario(rows, cols, args.work_dir))
+
+    results = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "backend": args.backend,
+        "scenarios": [],
+    }
+    for name, config_file in scenarios:
+        print(f"⏱️ Benchmarking {name} ({args.backend})...")
+        # One process per scenario keeps peak RSS and simulator state separate
+        with concurrent.futures.ProcessPoolExecutor(max_workers=1) as pool:
+            report = pool.submit(run_scenario, name, config_file, args.backend,
+                                 args.iterations, args.evaluation_steps, args.solver).result()
+        results["scenarios"].append(report)
+        if "error" in report:
+            print(f"❌ {name}: {report['error']}")
+        else:
+            print(f"✅ {name}: {report['steps_per_second']:.0f} steps/s, "
+                  f"{report['traci_calls_per_step']:.1f} TraCI calls/step, "
+                  f"peak RSS {report['peak_rss_kb']['self'] // 1024} MiB")
+
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"✅ Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), results)
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,24 @@
-import sumolib
+import sys
+from network_index import NetworkIndex
 
-# Load the network
-net = sumolib.net.readNet('network.net.xml')
+# Load the network (indexed once, then read from .netcache)
+net_file = sys.argv[1] if len(sys.argv) > 1 else 'network.net.xml'
+index = NetworkIndex.load(net_file)
 
 # Print all edges
 print("=== ALL EDGES IN NETWORK ===")
-for edge in net.getEdges():
-    print(f"Edge: {edge.getID()}, From: {edge.getFromNode().getID()}, To: {edge.getToNode().getID()}")
-
-print("\n=== EDGES THAT CAN BE USED IN ROUTES ===")
-# Only regular edges (not internal ones)
-for edge in net.getEdges():
-    if not edge.isSpecial():
-        print(f"Edge: {edge.getID()}")
\ No newline at end of file
+for edge, successors in index.successors.items():
+    print(f"Edge: {edge}, Lanes: {len(index.edges[edge])}, Leads to: {', '.join(sorted(successors)) or '-'}")
+
+print("\n=== TRAFFIC LIGHTS ===")
+for tls_id in index.tls:
+    print(f"TLS: {tls_id}, Links: {len(index.tls[tls_id])}, Incoming edges: {', '.join(index.incoming_edges(tls_id))}")
+
+# Validate route files given after the network
+for route_file in sys.argv[2:]:
+    invalid = index.validate_route_file(route_file)
+    print(f"\n=== ROUTES IN {route_file} ===")
+    if not invalid:
+        print("✅ All routes valid")
+    for route_id, problems in invalid.items():
+        print(f"❌ {route_id}: {'; '.join(problems)}")
@@ -1,54 +1,87 @@
+import argparse
+import itertools
+import json
 import os
-import sys
-import traci
+import random
 import time
+from game_solver import SOLVER_METHODS, GreenTimeGame, decide_green_times
+from metrics_collector import MetricsCollector
+from network_index import NetworkIndex
+from payoff import PayoffEngine
+from phase_builder import PhaseProgramBuilder
+from profiling import Profiler
+from simulator_backend import add_backend_argument, add_sumo_tools_path, get_backend
+from utils import file_hash, parse_time_of_day
+
+OBSERVE_MODES = ("end", "empty", "steps")
 
 class CooperativeTrafficControl:
-    def __init__(self):
+    def __init__(self, backend=None, solver=None, method="best_response"):
+        self.backend = backend if backend is not None else get_backend()
+        self.sim = self.backend.api
+        self.solver = solver
+        self.method = method
+        self.payoff = solver.payoff if solver is not None else PayoffEngine()
         self.green_times = {"A": 30, "B": 30}
         self.yellow_time = 3
         self.iteration = 0
+        self.collector = None
+        self.phases = None
+        self.sink = None
+        self.regions = None
+        self.last_averages = None
+        self.index = None
+        self.multi_objective = False
+        self.objectives = None
+        self.objective_weights = None
+        self.last_front = None
+        self.adaptive_sampling = False
+        self.early_stop = None
+        self.last_evaluation = None
+        self.surrogate = None
+        self.profiler = Profiler()
+        self.verbose = True
         
     def set_traffic_light_phases(self, tls_id, green_time):
         """Set adaptive traffic light phases"""
         try:
-            # Define phases for the intersection
-            # Phase 0: Main corridor (west->east) green
+            # Phase 0: Main corridor green
             # Phase 1: Yellow for main corridor
             # Phase 2: Side streets green
             # Phase 3: Yellow for side streets
-            
-            if tls_id == "A":
-                # For intersection A: west_in, northA_in, southA_in -> A_to_B
-                phases = [
-                    traci.trafficlight.Phase(green_time, "GGGrrrrrr", 0, 0),  # Main green
-                    traci.trafficlight.Phase(self.yellow_time, "yyyrrrrrr", 0, 0),  # Main yellow
-                    traci.trafficlight.Phase(green_time, "rrrGGGrrr", 0, 0),  # Side green
-                    traci.trafficlight.Phase(self.yellow_time, "rrryyyrrr", 0, 0),  # Side yellow
-                ]
-            else:  # Intersection B
-                # For intersection B: A_to_B, northB_in, southB_in -> B_to_east
-                phases = [
-                    traci.trafficlight.Phase(green_time, "GGGrrrrrr", 0, 0),  # Main green
-                    traci.trafficlight.Phase(self.yellow_time, "yyyrrrrrr", 0, 0),  # Main yellow
-                    traci.trafficlight.Phase(green_time, "rrrGGGrrr", 0, 0),  # Side green
-                    traci.trafficlight.Phase(self.yellow_time, "rrryyyrrr", 0, 0),  # Side yellow
-                ]
-            
-            logic = traci.trafficlight.Logic(
-                programID=f"cooperative_{tls_id}",
-                type=0,
-                currentPhaseIndex=0,
-                phases=phases
-            )
-            
-            traci.trafficlight.setCompleteRedYellowGreenDefinition(tls_id, logic)
-            traci.trafficlight.setProgram(tls_id, f"cooperative_{tls_id}")
-            print(f"✅ {tls_id}: Green time = {green_time}s")
+            # States are derived from the TLS's controlled links and cached
+            if self.phases is None:
+                self.phases = PhaseProgramBuilder(self.sim, index=self.index)
+            logic = self.phases.get_logic(tls_id, green_time, self.yellow_time)
+            trafficlight = self.sim.trafficlight
+            program = f"cooperative_{tls_id}"
+
+            # Retiming a running cooperative program must not restart the
+            # cycle: jumping from side green to main green skips the yellow.
+            # Keep the current phase and its remaining time instead
+            resume = None
+            if trafficlight.getProgram(tls_id) == program:
+                now = self.sim.simulation.getTime()
+                resume = trafficlight.getPhase(tls_id), trafficlight.getNextSwitch(tls_id) - now
+
+            trafficlight.setCompleteRedYellowGreenDefinition(tls_id, logic)
+            trafficlight.setProgram(tls_id, program)
+            if resume is not None:
+                phase, remaining = resume
+                trafficlight.setPhase(tls_id, phase)
+                trafficlight.setPhaseDuration(tls_id, max(remaining, 0))
+            if self.verbose:
+                print(f"✅ {tls_id}: Green time = {green_time}s")
             
         except Exception as e:
             print(f"❌ Error setting TLS {tls_id}: {e}")
 
+    def controlled_lanes(self, tls_id):
+        """Incoming lane per controlled link, from the network index when available"""
+        if self.index is not None:
+            return self.index.controlled_lanes(tls_id)
+        return self.sim.trafficlight.getControlledLanes(tls_id)
+
     def get_intersection_waiting_time(self, tls_id):
         """Calculate average waiting time for vehicles at intersection"""
         try:
@@ -56,14 +89,14 @@ class CooperativeTrafficControl:
             vehicle_count = 0
             
             # Get controlled lanes for this traffic light
-            controlled_lanes = traci.trafficlight.getControlledLanes(tls_id)
+            controlled_lanes = self.controlled_lanes(tls_id)
             
             for lane in controlled_lanes:
-                vehicles = traci.lane.getLastStepVehicleIDs(lane)
+                vehicles = self.sim.lane.getLastStepVehicleIDs(lane)
                 for vehicle in vehicles:
-                    speed = traci.vehicle.getSpeed(vehicle)
+                    speed = self.sim.vehicle.getSpeed(vehicle)
                     if speed < 0.1:  # Vehicle is stopped or very slow
-                        wait_time = traci.vehicle.getWaitingTime(vehicle)
+                        wait_time = self.sim.vehicle.getWaitingTime(vehicle)
                         total_wait += wait_time
                         vehicle_count += 1
             
@@ -77,10 +110,10 @@ class CooperativeTrafficControl:
         """Count vehicles approaching the intersection"""
         try:
             vehicle_count = 0
-            controlled_lanes = traci.trafficlight.getControlledLanes(tls_id)
+            controlled_lanes = self.controlled_lanes(tls_id)
             
             for lane in controlled_lanes:
-                vehicle_count += traci.lane.getLastStepVehicleNumber(lane)
+                vehicle_count += self.sim.lane.getLastStepVehicleNumber(lane)
                 
             return vehicle_count
         except Exception as e:
@@ -89,80 +122,153 @@ class CooperativeTrafficControl:
 
     def cooperative_decision(self, wait_A, wait_B, vehicles_A, vehicles_B):
         """Make cooperative decision to adjust green times"""
-        # Simple cooperative algorithm
-        total_wait = wait_A + wait_B
-        total_vehicles = vehicles_A + vehicles_B
+        # Green proportional to demand (waits and vehicles), smoothing the
+        # transition; without demand the current plan stays
+        current = [self.green_times["A"], self.green_times["B"]]
+        new_A, new_B = decide_green_times([wait_A, wait_B], [vehicles_A, vehicles_B], current, payoff=self.payoff)
+        return float(new_A), float(new_B)
+
+    def ensure_collector(self):
+        """Create and subscribe the metrics collector for the current players if needed"""
+        if self.collector is None:
+            self.collector = MetricsCollector(list(self.green_times), api=self.sim, index=self.index)
+            if self.multi_objective:
+                from objectives import ObjectiveTracker
+                self.objectives = ObjectiveTracker(self.collector, self.sim.simulation.getDeltaT())
+            self.collector.subscribe()
+        return self.collector
+
+    def measure_demands(self, steps=60, sample_interval=10):
+        """Demand per intersection over the next steps, weighted like cooperative_decision"""
+        collector = self.ensure_collector()
+        samples = []
+        for step in range(steps):
+            self.sim.simulationStep()
+            if step % sample_interval == 0:
+                samples.append(collector.collect())
+        demands = {}
+        for tls_id in self.green_times:
+            wait = sum(metrics[tls_id]["wait"] for metrics in samples) / len(samples)
+            vehicles = sum(metrics[tls_id]["vehicles"] for metrics in samples) / len(samples)
+            demands[tls_id] = float(self.payoff.demand(wait, vehicles))
+        return demands
+
+    def evaluate_plan(self, evaluation_steps=300, sample_interval=10):
+        """Simulate the current plan and return average metrics per intersection"""
+        from online_stats import AdaptiveSampler, ConfidenceStop, EvaluationStats
+        self.ensure_collector()
         
-        if total_wait == 0 and total_vehicles == 0:
-            return self.green_times["A"], self.green_times["B"]
+        # Set traffic light programs for the plan under evaluation
+        profiler = self.profiler
+        with profiler.stage("reprogram"):
+            for tls_id, green_time in self.green_times.items():
+                self.set_traffic_light_phases(tls_id, green_time)
         
-        # Adjust based on both waiting time and vehicle count
-        demand_A = (wait_A + vehicles_A * 2) / 10
-        demand_B = (wait_B + vehicles_B * 2) / 10
+        stats = EvaluationStats(self.green_times)
+        sampler = AdaptiveSampler(sample_interval) if self.adaptive_sampling else None
+        stopper = ConfidenceStop(self.early_stop) if self.early_stop else None
         
-        total_demand = demand_A + demand_B
+        sink = self.sink
+        objectives = self.objectives
+        if objectives is not None:
+            objectives.reset()
         
-        if total_demand > 0:
-            # Distribute green time proportionally to demand
-            new_A = max(20, min(50, 30 * (demand_A / total_demand) * 2))
-            new_B = max(20, min(50, 30 * (demand_B / total_demand) * 2))
+        step = 0
+        next_sample = 0
+        next_print = 0
+        while step < evaluation_steps:
+            with profiler.stage("step"):
+                self.sim.simulationStep()
+            if objectives is not None:
+                with profiler.stage("objectives"):
+                    objectives.update()
             
-            # Smooth the transition
-            smooth_A = 0.7 * self.green_times["A"] + 0.3 * new_A
-            smooth_B = 0.7 * self.green_times["B"] + 0.3 * new_B
+            sample = step == next_sample
+            if sink is not None and step % sink.interval == 0:
+                with profiler.stage("collect"):
+                    metrics = self.collector.collect()
+                    sink.record(self.sim.simulation.getTime(), metrics)
+            elif sample:
+                with profiler.stage("collect"):
+                    metrics = self.collector.collect()
             
-            return smooth_A, smooth_B
-        else:
-            return self.green_times["A"], self.green_times["B"]
+            if sample:
+                # Each sample stands for the steps until the next one
+                queues = [metrics[tls_id]["queue"] for tls_id in self.green_times]
+                interval = sampler.next_interval(queues) if sampler is not None else sample_interval
+                stats.update(metrics, weight=min(interval, evaluation_steps - step))
+                next_sample = step + interval
+                
+                if self.verbose and step >= next_print:
+                    next_print = step + 30
+                    summary = " | ".join(
+                        f"{tls_id}(wait:{metrics[tls_id]['wait']:.1f}s, vehicles:{metrics[tls_id]['vehicles']})"
+                        for tls_id in self.green_times
+                    )
+                    print(f"⏱️ Step {step}: {summary}")
+            
+            step += 1
+            if sample and stopper is not None and stopper.done(stats.total_wait, step):
+                break
+        
+        averages = stats.averages()
+        if objectives is not None:
+            for tls_id, values in objectives.results().items():
+                averages[tls_id].update(values)
+        self.last_averages = averages
+        self.last_evaluation = {
+            "steps": step,
+            "samples": stats.wait.count,
+            "total_wait_ci": float(stats.total_wait.half_width()[0]) if stats.wait.count > 1 else None,
+        }
+        if self.verbose and step < evaluation_steps:
+            print(f"⏹️ Stopped after {step}/{evaluation_steps} steps ({stats.wait.count} samples): "
+                  f"total wait {stats.total_wait.mean[0]:.1f}s ± {self.last_evaluation['total_wait_ci']:.1f}s")
+        return averages
+
+    def discover_intersections(self):
+        """Make every traffic light in the network a player"""
+        base_green = self.solver.base_green if self.solver is not None else 30
+        self.green_times = {
+            tls_id: self.green_times.get(tls_id, base_green)
+            for tls_id in self.sim.trafficlight.getIDList()
+        }
+        self.collector = None
+        return list(self.green_times)
+
+    def solve_green_times(self, averages):
+        """Decision over all intersections: the configured solver, else the proportional rule"""
+        if self.regions is not None:
+            return self.regions.solve(averages, self.green_times, self.method)
+        tls_ids = list(self.green_times)
+        new_times = decide_green_times(
+            [averages[tls_id]["wait"] for tls_id in tls_ids],
+            [averages[tls_id]["vehicles"] for tls_id in tls_ids],
+            [self.green_times[tls_id] for tls_id in tls_ids],
+            solver=self.solver, method=self.method, payoff=self.payoff,
+        )
+        return dict(zip(tls_ids, new_times.tolist()))
 
     def run_iteration(self):
         """Run one iteration of cooperative control"""
         self.iteration += 1
         print(f"\n🔄 === Cooperative Control Iteration {self.iteration} ===")
         
-        # Set initial traffic light programs
-        self.set_traffic_light_phases("A", self.green_times["A"])
-        self.set_traffic_light_phases("B", self.green_times["B"])
+        if self.solver is not None:
+            return self.run_game_iteration()
         
         # Run simulation for evaluation period
-        evaluation_steps = 300  # 300 seconds
-        step = 0
-        
-        wait_times_A = []
-        wait_times_B = []
-        vehicle_counts_A = []
-        vehicle_counts_B = []
-        
-        while step < evaluation_steps:
-            traci.simulationStep()
-            
-            # Collect metrics every 10 seconds
-            if step % 10 == 0:
-                wait_A = self.get_intersection_waiting_time("A")
-                wait_B = self.get_intersection_waiting_time("B")
-                vehicles_A = self.get_intersection_vehicle_count("A")
-                vehicles_B = self.get_intersection_vehicle_count("B")
-                
-                wait_times_A.append(wait_A)
-                wait_times_B.append(wait_B)
-                vehicle_counts_A.append(vehicles_A)
-                vehicle_counts_B.append(vehicles_B)
-                
-                if step % 30 == 0:
-                    print(f"⏱️ Step {step}: A(wait:{wait_A:.1f}s, vehicles:{vehicles_A}) | B(wait:{wait_B:.1f}s, vehicles:{vehicles_B})")
-            
-            step += 1
-        
-        # Calculate averages
-        avg_wait_A = sum(wait_times_A) / len(wait_times_A) if wait_times_A else 0
-        avg_wait_B = sum(wait_times_B) / len(wait_times_B) if wait_times_B else 0
-        avg_vehicles_A = sum(vehicle_counts_A) / len(vehicle_counts_A) if vehicle_counts_A else 0
-        avg_vehicles_B = sum(vehicle_counts_B) / len(vehicle_counts_B) if vehicle_counts_B else 0
+        averages = self.evaluate_plan(evaluation_steps=300)
+        avg_wait_A = averages["A"]["wait"]
+        avg_wait_B = averages["B"]["wait"]
+        avg_vehicles_A = averages["A"]["vehicles"]
+        avg_vehicles_B = averages["B"]["vehicles"]
         
         print(f"📊 Averages - A: {avg_wait_A:.1f}s wait, {avg_vehicles_A:.1f} vehicles | B: {avg_wait_B:.1f}s wait, {avg_vehicles_B:.1f} vehicles")
         
         # Make cooperative decision
-        new_A, new_B = self.cooperative_decision(avg_wait_A, avg_wait_B, avg_vehicles_A, avg_vehicles_B)
+        with self.profiler.stage("decision"):
+            new_A, new_B = self.cooperative_decision(avg_wait_A, avg_wait_B, avg_vehicles_A, avg_vehicles_B)
         
         print(f"🔄 Adjusting: A {self.green_times['A']:.1f}s → {new_A:.1f}s | B {self.green_times['B']:.1f}s → {new_B:.1f}s")
         
@@ -171,77 +277,555 @@ class CooperativeTrafficControl:
         
         return avg_wait_A + avg_wait_B  # Return total waiting time for stopping condition
 
-def main():
-    if 'SUMO_HOME' in os.environ:
-        tools = os.path.join(os.environ['SUMO_HOME'], 'tools')
-        sys.path.append(tools)
-    else:
+    def run_game_iteration(self):
+        """Evaluate the current plan and re-solve the game for every intersection"""
+        averages = self.evaluate_plan(evaluation_steps=300)
+        total_wait = sum(metrics["wait"] for metrics in averages.values())
+        total_vehicles = sum(metrics["vehicles"] for metrics in averages.values())
+        print(f"📊 Averages - {len(averages)} intersections: {total_wait:.1f}s total wait, {total_vehicles:.1f} vehicles")
+        
+        with self.profiler.stage("decision"):
+            new_times = self.solve_green_times(averages)
+        changes = [
+            f"{tls_id} {self.green_times[tls_id]:.1f}s → {green_time:.1f}s"
+            for tls_id, green_time in new_times.items()
+        ]
+        print(f"🔄 Adjusting ({self.method}): " + " | ".join(changes[:10]) + (" | ..." if len(changes) > 10 else ""))
+        
+        self.green_times = new_times
+        return total_wait
+
+    def candidate_plans(self, offsets=(-10, -5, 0, 5, 10), min_green=20, max_green=50, max_candidates=32):
+        """At most max_candidates green-time plans around the current one, one offset per intersection"""
+        tls_ids = list(self.green_times)
+        plans = []
+        seen = set()
+
+        def add(combo):
+            plan = {
+                tls_id: max(min_green, min(max_green, self.green_times[tls_id] + offset))
+                for tls_id, offset in zip(tls_ids, combo)
+            }
+            key = tuple(plan.values())
+            if key not in seen:
+                seen.add(key)
+                plans.append(plan)
+
+        if len(offsets) ** len(tls_ids) <= max_candidates:
+            for combo in itertools.product(offsets, repeat=len(tls_ids)):
+                add(combo)
+            return plans
+
+        # The full product grows as len(offsets) ** N: keep the current plan,
+        # then moves of one intersection at a time, then random combinations
+        rng = random.Random(self.iteration)
+        add([0] * len(tls_ids))
+        moves = [(i, offset) for i in range(len(tls_ids)) for offset in offsets if offset != 0]
+        rng.shuffle(moves)
+        for i, offset in moves[:max_candidates - 1]:
+            combo = [0] * len(tls_ids)
+            combo[i] = offset
+            add(combo)
+        for _ in range(10 * max_candidates):
+            if len(plans) >= max_candidates:
+                break
+            add([rng.choice(offsets) for _ in tls_ids])
+        return plans
+
+    def run_candidate_iteration(self, evaluator, candidates=None):
+        """Score a batch of candidate plans with an evaluator and adopt the best one"""
+        self.iteration += 1
+        print(f"\n🔄 === Candidate Control Iteration {self.iteration} ===")
+        
+        surrogate = self.surrogate
+        if candidates is None:
+            if surrogate is None:
+                candidates = self.candidate_plans()
+            elif surrogate.ready:
+                # A bounded sample for the surrogate to rank, never the full product
+                candidates = self.candidate_plans(max_candidates=surrogate.samples)
+            else:
+                # Nothing to predict from yet: a small batch calibrates it
+                candidates = self.candidate_plans(max_candidates=surrogate.calibration)
+        
+        if surrogate is not None and surrogate.ready and len(candidates) > surrogate.top_k:
+            # Only the candidates the surrogate ranks best go to the simulator
+            with self.profiler.stage("surrogate"):
+                shortlist = surrogate.shortlist(candidates)
+            print(f"🧮 Surrogate shortlist: simulating {len(shortlist)} of {len(candidates)} candidates")
+            candidates = shortlist
+        
+        with self.profiler.stage("candidates"):
+            results = evaluator.evaluate(candidates)
+        if surrogate is not None:
+            with self.profiler.stage("surrogate"):
+                surrogate.update(results)
+        if self.multi_objective:
+            best = self.choose_from_front(results)
+        else:
+            best = min(results, key=lambda result: result["total_wait"])
+        
+        steps = sum(result.get("steps", 0) for result in results)
+        print(f"📊 Evaluated {len(results)} candidates in {steps} simulated steps, "
+              f"best total wait {best['total_wait']:.1f}s")
+        print("🔄 Adjusting: " + " | ".join(
+            f"{tls_id} {self.green_times[tls_id]:.1f}s → {green_time:.1f}s"
+            for tls_id, green_time in best["green_times"].items()
+        ))
+        
+        self.green_times.update(best["green_times"])
+        if best.get("metrics"):
+            self.last_averages = best["metrics"]
+        return best["total_wait"]
+
+    def choose_from_front(self, results):
+        """Pareto front of the candidates' objectives, then the best one under objective_weights"""
+        from objectives import choose, network_objectives, objective_matrix, pareto_front
+        scored = [result for result in results if not result["error"] and result["metrics"]]
+        if not scored:
+            return min(results, key=lambda result: result["total_wait"])
+        for result in scored:
+            result["objectives"] = network_objectives(result["metrics"])
+        points = objective_matrix([result["objectives"] for result in scored])
+        front = pareto_front(points)
+        self.last_front = [scored[i] for i in front]
+        best = scored[choose(points, front, self.objective_weights)]
+        print(f"🎯 Pareto front: {len(front)} of {len(scored)} candidates | chosen: " + ", ".join(
+            f"{name} {value:.1f}" for name, value in best["objectives"].items()
+        ))
+        return best
+
+    def run_what_if_iteration(self, engine, candidates=None):
+        """Pick the best plan from the current state, then run it on the live simulation"""
+        self.run_candidate_iteration(engine, candidates)
+        
+        averages = self.evaluate_plan(evaluation_steps=engine.evaluation_steps,
+                                      sample_interval=engine.sample_interval)
+        total_wait = sum(metrics["wait"] for metrics in averages.values())
+        print(f"📊 Live total wait with adopted plan: {total_wait:.1f}s")
+        if self.surrogate is not None:
+            self.surrogate.update([{"green_times": dict(self.green_times), "metrics": averages}])
+        return total_wait
+
+    def run_decoupled(self, steps, window=300, sample_interval=10, capacity=4096):
+        """Step without pausing for decisions; return (average total wait, plans applied)"""
+        import multiprocessing
+        from shared_observations import ObservationRing, PlanBoard, decision_worker
+
+        tls_ids = list(self.green_times)
+        self.ensure_collector()
+        for tls_id, green_time in self.green_times.items():
+            self.set_traffic_light_phases(tls_id, green_time)
+
+        ring = ObservationRing(len(tls_ids), capacity)
+        board = PlanBoard(len(tls_ids))
+        stop = multiprocessing.Event()
+        worker = multiprocessing.Process(target=decision_worker, daemon=True, args=(
+            ring.name, board.name, len(tls_ids), capacity, [self.green_times[tls_id] for tls_id in tls_ids],
+            window, self.solver, self.method, stop,
+        ))
+        worker.start()
+
+        sim = self.sim
+        profiler = self.profiler
+        version = 0
+        plans = 0
+        wait_sum = 0.0
+        samples = 0
+        try:
+            for step in range(steps):
+                with profiler.stage("step"):
+                    sim.simulationStep()
+                if step % sample_interval == 0:
+                    now = sim.simulation.getTime()
+                    with profiler.stage("collect"):
+                        metrics = self.collector.collect()
+                        ring.write_metrics(now, metrics, tls_ids)
+                        if self.sink is not None:
+                            self.sink.record(now, metrics)
+                    wait_sum += sum(values["wait"] for values in metrics.values())
+                    samples += 1
+
+                # Apply a plan as soon as one is published; stepping never waits for the solver
+                if board.version[0] != version:
+                    version, green = board.read()
+                    plans += 1
+                    if self.verbose:
+                        print(f"🔄 {sim.simulation.getTime():.0f}s plan {plans}: " + " | ".join(
+                            f"{tls_id} {self.green_times[tls_id]:.1f}s → {green_time:.1f}s"
+                            for tls_id, green_time in list(zip(tls_ids, green.tolist()))[:10]))
+                    with profiler.stage("reprogram"):
+                        for tls_id, green_time in zip(tls_ids, green.tolist()):
+                            if green_time != self.green_times[tls_id]:
+                                self.green_times[tls_id] = green_time
+                                self.set_traffic_light_phases(tls_id, green_time)
+        finally:
+            stop.set()
+            worker.join(timeout=10)
+            if worker.is_alive():
+                worker.kill()
+            ring.close()
+            board.close()
+        return (wait_sum / samples if samples else 0), plans
+
+    def observe(self, until="end", max_steps=None, sample_interval=10):
+        """Run the adopted plan headless until an OBSERVE_MODES condition or max_steps; return final KPIs"""
+        if until not in OBSERVE_MODES:
+            raise ValueError(f"Unknown end condition '{until}', expected one of {OBSERVE_MODES}")
+        if until == "steps" and max_steps is None:
+            raise ValueError("Observing until 'steps' needs max_steps")
+        import traci.constants as tc
+        self.ensure_collector()
+        
+        # Simulation-wide counters arrive with each step, no extra round trips
+        sim = self.sim
+        sim.simulation.subscribe([
+            tc.VAR_TIME, tc.VAR_MIN_EXPECTED_VEHICLES, tc.VAR_DEPARTED_VEHICLES_NUMBER,
+            tc.VAR_ARRIVED_VEHICLES_NUMBER, tc.VAR_TELEPORT_STARTING_VEHICLES_NUMBER,
+        ])
+        end_time = sim.simulation.getEndTime()
+        start_time = now = sim.simulation.getTime()
+        started = time.perf_counter()
+        
+        objectives = self.objectives
+        if objectives is not None:
+            objectives.reset()
+
+        steps = departed = arrived = teleports = max_queue = samples = 0
+        wait_sum = 0.0
+        stopped_by = "steps"
+        while max_steps is None or steps < max_steps:
+            if until == "end" and 0 <= end_time <= now:
+                stopped_by = "end"
+                break
+            with self.profiler.stage("step"):
+                sim.simulationStep()
+            steps += 1
+            state = sim.simulation.getSubscriptionResults()
+            now = state[tc.VAR_TIME]
+            departed += state[tc.VAR_DEPARTED_VEHICLES_NUMBER]
+            arrived += state[tc.VAR_ARRIVED_VEHICLES_NUMBER]
+            teleports += state[tc.VAR_TELEPORT_STARTING_VEHICLES_NUMBER]
+            if objectives is not None:
+                with self.profiler.stage("objectives"):
+                    objectives.update()
+            
+            if steps % sample_interval == 0:
+                with self.profiler.stage("collect"):
+                    metrics = self.collector.collect()
+                    if self.sink is not None:
+                        self.sink.record(now, metrics)
+                wait_sum += sum(values["wait"] for values in metrics.values())
+                max_queue = max(max_queue, max((values["queue"] for values in metrics.values()), default=0))
+                samples += 1
+            
+            if until in ("end", "empty") and state[tc.VAR_MIN_EXPECTED_VEHICLES] == 0:
+                stopped_by = "empty"
+                break
+        sim.simulation.unsubscribe("")
+        
+        seconds = time.perf_counter() - started
+        simulated = now - start_time
+        kpis = {
+            "stopped_by": stopped_by,
+            "steps": steps,
+            "sim_time": now,
+            "departed": departed,
+            "arrived": arrived,
+            "teleports": teleports,
+            "throughput_per_hour": arrived * 3600 / simulated if simulated > 0 else 0,
+            "avg_wait": wait_sum / samples if samples else 0,
+            "max_queue": max_queue,
+            "wall_seconds": seconds,
+            "steps_per_second": steps / seconds if seconds > 0 else 0,
+        }
+        if objectives is not None:
+            from objectives import network_objectives
+            kpis["objectives"] = network_objectives(objectives.results())
+        return kpis
+
+def parse_args(argv=None):
+    from objectives import parse_weights
+    parser = argparse.ArgumentParser(description="Cooperative traffic signal control")
+    parser.add_argument("-c", "--config", default="generated_config.sumocfg",
+                        help="SUMO configuration file")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="evaluate candidate plans in parallel with this many headless workers")
+    parser.add_argument("--pool",
+                        help="evaluate candidate plans on a running simulator_pool.py service (host:port or socket)")
+    parser.add_argument("--solver", choices=SOLVER_METHODS,
+                        help="solve the N-intersection game with this method instead of the pairwise rule")
+    parser.add_argument("--metrics-dir",
+                        help="stream per-step, per-TLS samples to .npy chunks in this directory")
+    parser.add_argument("--quiet", action="store_true", help="skip per-step progress output")
+    parser.add_argument("--event-driven", action="store_true",
+                        help="re-optimise each intersection on queue/demand/cycle events")
+    parser.add_argument("--steps", type=int, default=1500,
+                        help="simulated seconds to run in event-driven or decoupled mode")
+    parser.add_argument("--decoupled", action="store_true",
+                        help="keep stepping while a separate process decides from shared-memory observations")
+    parser.add_argument("--what-if", action="store_true",
+                        help="score candidate plans from a saved state at each decision point")
+    parser.add_argument("--region-size", type=int,
+                        help="solve the game in regions of at most this many adjacent intersections")
+    parser.add_argument("--region-workers", type=int, default=1,
+                        help="processes solving regions in parallel")
+    parser.add_argument("--plan-store",
+                        help="SQLite file to warm-start from and save converged plans to")
+    parser.add_argument("--time-of-day", type=parse_time_of_day, default=0,
+                        help="wall-clock time (HH:MM) at simulation time 0, for the plan store")
+    parser.add_argument("--profile", action="store_true",
+                        help="print per-iteration stage timings and TraCI call counts")
+    parser.add_argument("--trace", help="write stage timings as Chrome trace JSON to this file")
+    parser.add_argument("--cprofile", help="run under cProfile and write the stats to this file")
+    parser.add_argument("--tracemalloc", action="store_true",
+                        help="track Python memory per iteration and report top allocations")
+    parser.add_argument("--port", type=int, help="TraCI port (default: pick a free one)")
+    parser.add_argument("--seed", type=int, help="SUMO random seed")
+    parser.add_argument("--scale", type=float, help="scale all route demand by this factor")
+    parser.add_argument("--observe-until", choices=OBSERVE_MODES, default="end",
+                        help="stop observing the final plan at the simulation end time, once no "
+                             "vehicles are left, or after --observe-steps")
+    parser.add_argument("--observe-steps", type=int,
+                        help="maximum steps to observe the final plan")
+    parser.add_argument("--results", help="write a JSON run summary to this file")
+    parser.add_argument("--objectives", action="store_true",
+                        help="also measure throughput, CO2, fuel, stops and fairness, and pick "
+                             "candidate plans from their Pareto front")
+    parser.add_argument("--objective-weights", type=parse_weights,
+                        help="weights for choosing from the Pareto front, e.g. delay=2,co2=0.5")
+    parser.add_argument("--surrogate-top", type=int, metavar="K",
+                        help="with --workers, --pool or --what-if, simulate only the K candidate plans a "
+                             "Webster delay surrogate ranks best, refining it from each batch")
+    parser.add_argument("--adaptive-sampling", action="store_true",
+                        help="sample metrics densely while queues change and sparsely while they are stable")
+    parser.add_argument("--early-stop", type=float, metavar="TOLERANCE",
+                        help="end a plan evaluation once the 95%% confidence interval on its total wait "
+                             "is within this relative tolerance, e.g. 0.05")
+    add_backend_argument(parser)
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    # Feature modules are imported where a run uses them, so evaluation
+    # workers that import this module only pay for the core
+    from regions import net_file_from_config
+
+    if not add_sumo_tools_path():
         print("❌ Please set SUMO_HOME environment variable")
         return
 
-    sumoBinary = "sumo-gui"
-    config_file = "generated_config.sumocfg"
+    config_file = args.config
     
     if not os.path.exists(config_file):
         print("❌ Config file not found!")
         return
 
+    engine = None
+    evaluator = None
+    store = None
+    
+    # Index the network once; later runs load it from .netcache
+    index = NetworkIndex.load(net_file_from_config(config_file))
+    
     # Create controller
-    controller = CooperativeTrafficControl()
+    backend = get_backend(args.backend, port=args.port)
+    if args.region_size and not args.solver:
+        args.solver = "best_response"
+    solver = GreenTimeGame() if args.solver else None
+    controller = CooperativeTrafficControl(backend, solver=solver, method=args.solver)
+    controller.verbose = not args.quiet
+    controller.index = index
+    controller.multi_objective = args.objectives or args.objective_weights is not None
+    controller.objective_weights = args.objective_weights
+    controller.adaptive_sampling = args.adaptive_sampling
+    controller.early_stop = args.early_stop
+    profiler = Profiler(args.profile, trace=bool(args.trace), cprofile=bool(args.cprofile),
+                        memory=args.tracemalloc)
+    controller.profiler = profiler
+    controller.sim = profiler.instrument(controller.sim)
+    sim = backend.api
+    summary = {"config": config_file, "backend": args.backend, "seed": args.seed,
+               "scale": args.scale, "solver": args.solver, "waits": []}
     
     print("🚦 Starting Cooperative Traffic Signal Control")
     print("=============================================")
     
     try:
         # Start SUMO
-        sumoCmd = [sumoBinary, "-c", config_file, "--start"]
-        traci.start(sumoCmd)
+        sumo_args = ["-c", config_file]
+        if args.what_if or args.workers > 0 or args.pool:
+            # Candidates restore the live state, random number streams included
+            sumo_args.append("--save-state.rng")
+        if args.seed is not None:
+            sumo_args += ["--seed", str(args.seed)]
+        if args.scale is not None:
+            sumo_args += ["--scale", str(args.scale)]
+        backend.start(sumo_args)
+        
+        print(f"✅ SUMO started successfully! ({backend.name})")
+        profiler.start()
+        print(f"✅ Traffic lights: {sim.trafficlight.getIDList()}")
+        print(f"✅ Edges: {len(index.edges)} edges, {len(index.tls)} traffic lights indexed")
+        
+        if solver is not None or args.workers > 0 or args.pool or args.what_if or args.event_driven \
+                or args.decoupled:
+            # Only the plain A/B iteration is tied to the original two intersections
+            print(f"✅ Players: {len(controller.discover_intersections())} intersections")
+        
+        if args.region_size:
+            from regions import RegionalCoordinator, RegionPartition
+            partition = RegionPartition(net_file_from_config(config_file), list(controller.green_times),
+                                        max_size=args.region_size)
+            controller.regions = RegionalCoordinator(partition, solver, api=sim, workers=args.region_workers)
+            print(f"✅ Regions: {len(partition.regions)} of up to {args.region_size} intersections, "
+                  f"{len(partition.boundaries)} boundary links")
+        
+        if args.plan_store:
+            from plan_store import PlanStore
+            store = PlanStore(args.plan_store)
+            network = file_hash(net_file_from_config(config_file))
+            # Plans are saved under the time optimisation started, so they
+            # are found again at the same time of day
+            plan_time = args.time_of_day + sim.simulation.getTime()
+            found = store.warm_start(network, controller.green_times, plan_time,
+                                     demands=controller.measure_demands())
+            print(f"✅ Warm start: {found}/{len(controller.green_times)} plans from {args.plan_store}")
         
-        print("✅ SUMO started successfully!")
-        print(f"✅ Traffic lights: {traci.trafficlight.getIDList()}")
-        print(f"✅ Edges: {len(traci.edge.getIDList())} edges loaded")
+        if args.metrics_dir:
+            from metrics_sink import MetricsSink
+            controller.sink = MetricsSink(args.metrics_dir, list(controller.green_times))
         
         # Run multiple iterations of cooperative control
         max_iterations = 5
         min_improvement = 0.1  # Stop if improvement is less than 10%
         
         previous_total_wait = float('inf')
+        if args.workers > 0 or args.pool:
+            from parallel_evaluation import ParallelEvaluator
+            evaluator = ParallelEvaluator(config_file, backend=args.backend, workers=args.workers,
+                                          objectives=controller.multi_objective, pool_address=args.pool,
+                                          adaptive_sampling=args.adaptive_sampling, early_stop=args.early_stop,
+                                          api=controller.sim)
+        elif args.what_if:
+            from what_if import WhatIfEngine
+            engine = WhatIfEngine(controller)
         
-        for iteration in range(max_iterations):
-            total_wait = controller.run_iteration()
+        candidate_source = evaluator if evaluator is not None else engine
+        if args.surrogate_top and candidate_source is not None:
+            from surrogate import DelaySurrogate
+            controller.surrogate = DelaySurrogate.from_collector(
+                controller.ensure_collector(), yellow_time=controller.yellow_time,
+                horizon=candidate_source.evaluation_steps, top_k=args.surrogate_top)
+        
+        if args.event_driven:
+            from scheduler import DecisionScheduler
+            scheduler = DecisionScheduler(controller)
+            profiler.begin_iteration("Event-driven run")
+            avg_wait = scheduler.run(args.steps)
+            profiler.end_iteration()
+            print(f"📊 Event-driven control: {sum(scheduler.decisions.values())} decisions in {args.steps}s, "
+                  f"average total wait {avg_wait:.1f}s")
+            print("📊 Events: " + ", ".join(f"{event}={count}" for event, count in scheduler.event_counts.items()))
+            summary["waits"].append(avg_wait)
+            summary["events"] = dict(scheduler.event_counts)
+        elif args.decoupled:
+            profiler.begin_iteration("Decoupled run")
+            avg_wait, plans = controller.run_decoupled(args.steps)
+            profiler.end_iteration()
+            print(f"📊 Decoupled control: {plans} plans applied in {args.steps}s, average total wait {avg_wait:.1f}s")
+            summary["waits"].append(avg_wait)
+            summary["plans"] = plans
+        else:
+            for iteration in range(max_iterations):
+                profiler.begin_iteration(f"Iteration {iteration + 1}")
+                if evaluator is not None or engine is not None:
+                    # Score candidates from the live state, then run the winner live
+                    total_wait = controller.run_what_if_iteration(evaluator if evaluator is not None else engine)
+                else:
+                    total_wait = controller.run_iteration()
+                profiler.end_iteration()
+                summary["waits"].append(total_wait)
+                if controller.multi_objective and controller.last_averages:
+                    from objectives import network_objectives
+                    totals = network_objectives(controller.last_averages)
+                    summary.setdefault("objectives", []).append(totals)
+                    print("🎯 Objectives: " + ", ".join(f"{name} {value:.1f}" for name, value in totals.items()))
             
-            # Check for convergence
-            if previous_total_wait != float('inf'):
-                improvement = (previous_total_wait - total_wait) / previous_total_wait
-                print(f"📈 Improvement: {improvement:.1%}")
+                # Check for convergence
+                if previous_total_wait != float('inf'):
+                    improvement = (previous_total_wait - total_wait) / previous_total_wait
+                    print(f"📈 Improvement: {improvement:.1%}")
                 
-                if improvement < min_improvement and improvement > 0:
-                    print("🎯 Convergence reached! Stopping optimization.")
-                    break
+                    if improvement < min_improvement and improvement > 0:
+                        print("🎯 Convergence reached! Stopping optimization.")
+                        break
             
-            previous_total_wait = total_wait
+                previous_total_wait = total_wait
         
         print("\n🎊 Cooperative Control Completed!")
         print("=================================")
         print(f"Final green times:")
-        print(f"🚦 Intersection A: {controller.green_times['A']:.1f} seconds")
-        print(f"🚦 Intersection B: {controller.green_times['B']:.1f} seconds")
+        for tls_id, green_time in controller.green_times.items():
+            print(f"🚦 Intersection {tls_id}: {green_time:.1f} seconds")
         print(f"Total iterations: {controller.iteration}")
         
-        # Keep simulation running to observe final configuration
-        print("\n👀 Observing final configuration... (Press Ctrl+C to stop)")
-        while True:
-            traci.simulationStep()
-            time.sleep(0.1)
+        if store is not None and controller.last_averages:
+            demands = {
+                tls_id: float(controller.payoff.demand(metrics["wait"], metrics["vehicles"]))
+                for tls_id, metrics in controller.last_averages.items()
+            }
+            store.save(network, controller.green_times, plan_time,
+                       demands, total_wait=summary["waits"][-1] if summary["waits"] else None,
+                       iterations=controller.iteration)
+            print(f"✅ Saved plan for {len(controller.green_times)} intersections to {args.plan_store}")
+        
+        summary["green_times"] = dict(controller.green_times)
+        summary["iterations"] = controller.iteration
+        
+        # Run the final configuration headless until the end condition
+        cap = f", at most {args.observe_steps} steps" if args.observe_steps is not None else ""
+        print(f"\n👀 Observing final configuration until {args.observe_until}{cap}...")
+        profiler.begin_iteration("Observation")
+        kpis = controller.observe(args.observe_until, args.observe_steps)
+        profiler.end_iteration()
+        summary["observation"] = kpis
+        summary["sim_time"] = kpis["sim_time"]
+        print(f"📊 Observed {kpis['steps']} steps ({kpis['stopped_by']}): {kpis['arrived']} arrived, "
+              f"{kpis['throughput_per_hour']:.0f} veh/h, average total wait {kpis['avg_wait']:.1f}s, "
+              f"max queue {kpis['max_queue']}, {kpis['teleports']} teleports, "
+              f"{kpis['steps_per_second']:.0f} steps/s")
+        if kpis.get("objectives"):
+            print("🎯 Objectives: " + ", ".join(f"{name} {value:.1f}" for name, value in kpis["objectives"].items()))
             
     except KeyboardInterrupt:
         print("\n⏹️ Simulation stopped by user")
     except Exception as e:
         print(f"❌ Error: {e}")
+        summary["error"] = str(e)
         import traceback
         traceback.print_exc()
     finally:
-        traci.close()
+        if profiler.enabled:
+            profiler.stop(args.cprofile)
+            summary["profile"] = profiler.summary()
+            if args.trace:
+                profiler.export_chrome_trace(args.trace)
+        if args.results:
+            with open(args.results, 'w') as f:
+                json.dump(summary, f, indent=2)
+        if controller.sink is not None:
+            controller.sink.close()
+            print(f"✅ Metrics written to {args.metrics_dir} ({controller.sink.samples} samples)")
+        if evaluator is not None:
+            evaluator.close()
+        if engine is not None:
+            engine.close()
+        if controller.regions is not None:
+            controller.regions.close()
+        if store is not None:
+            store.close()
+        backend.close()
         print("✅ Simulation closed")
 
 if __name__ == "__main__":
@@ -1,7 +1,13 @@
+import argparse
+import hashlib
+import shutil
 import subprocess
 import os
 import sys
 
+NETCONVERT_OPTIONS = ['--no-turnarounds']
+TLS_TYPES = ("static", "actuated", "delay_based")
+
 def create_network_files():
     """Create basic .nod.xml and .edg.xml files to generate a network"""
     
@@ -43,24 +49,111 @@ def create_network_files():
 
     print("✅ Created node and edge files")
 
-def generate_network():
-    """Use netconvert to generate the network"""
+def grid_node_id(row, col):
+    return f"J{row}_{col}"
+
+def write_grid_files(rows, cols, node_file, edge_file, spacing=200, lanes=1, side_lanes=1,
+                     speed=13.9, side_speed=10, tls_type="static"):
+    """Write node/edge files for a rows x cols grid of signalised junctions
+
+    Rows run east-west (main corridors, `speed`/`lanes`), columns run
+    north-south (side streets, `side_speed`/`side_lanes`). Every grid
+    junction gets a fringe node on each open side so traffic can enter and
+    leave. Files are streamed line by line, so large grids stay cheap.
+    """
+    if tls_type not in TLS_TYPES:
+        raise ValueError(f"Unknown signal type '{tls_type}', expected one of {TLS_TYPES}")
+
+    def fringe_nodes():
+        for row in range(rows):
+            yield f"west{row}", -spacing, row * spacing
+            yield f"east{row}", cols * spacing, row * spacing
+        for col in range(cols):
+            yield f"south{col}", col * spacing, -spacing
+            yield f"north{col}", col * spacing, rows * spacing
+
+    with open(node_file, 'w') as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n<nodes>\n')
+        for row in range(rows):
+            for col in range(cols):
+                f.write(f'    <node id="{grid_node_id(row, col)}" x="{col * spacing}" y="{row * spacing}" '
+                        f'type="traffic_light" tlType="{tls_type}"/>\n')
+        for node_id, x, y in fringe_nodes():
+            f.write(f'    <node id="{node_id}" x="{x}" y="{y}" type="priority"/>\n')
+        f.write('</nodes>\n')
+
+    def write_pair(f, a, b, num_lanes, lane_speed):
+        f.write(f'    <edge id="{a}_to_{b}" from="{a}" to="{b}" numLanes="{num_lanes}" speed="{lane_speed}"/>\n')
+        f.write(f'    <edge id="{b}_to_{a}" from="{b}" to="{a}" numLanes="{num_lanes}" speed="{lane_speed}"/>\n')
+
+    with open(edge_file, 'w') as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n<edges>\n')
+        f.write('    <!-- Main corridors -->\n')
+        for row in range(rows):
+            junctions = [f"west{row}"] + [grid_node_id(row, col) for col in range(cols)] + [f"east{row}"]
+            for a, b in zip(junctions, junctions[1:]):
+                write_pair(f, a, b, lanes, speed)
+        f.write('    <!-- Side streets -->\n')
+        for col in range(cols):
+            junctions = [f"south{col}"] + [grid_node_id(row, col) for row in range(rows)] + [f"north{col}"]
+            for a, b in zip(junctions, junctions[1:]):
+                write_pair(f, a, b, side_lanes, side_speed)
+        f.write('</edges>\n')
+
+    print(f"✅ Created {rows}x{cols} grid node and edge files")
+
+def write_arterial_files(signals, node_file, edge_file, **kwargs):
+    """Write node/edge files for an arterial of `signals` junctions with side streets"""
+    write_grid_files(1, signals, node_file, edge_file, **kwargs)
+
+def sumo_binary(name):
+    """Path of a SUMO tool binary (netconvert, duarouter, ...), preferring $SUMO_HOME/bin"""
+    if 'SUMO_HOME' in os.environ:
+        candidate = os.path.join(os.environ['SUMO_HOME'], 'bin', name)
+        if os.path.exists(candidate):
+            return candidate
+    return shutil.which(name) or name
+
+def netconvert_binary():
+    return sumo_binary('netconvert')
+
+def network_hash(node_file, edge_file, options):
+    """Content hash of everything that determines the netconvert output"""
+    digest = hashlib.sha256()
+    binary = netconvert_binary()
+    digest.update(binary.encode())
+    if os.path.exists(binary):
+        digest.update(str(os.path.getmtime(binary)).encode())
+    digest.update("\0".join(options).encode())
+    for path in (node_file, edge_file):
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+def build_network(node_file, edge_file, output_file, cache_dir=".netcache", options=None):
+    """Run netconvert unless a network built from identical inputs is cached"""
+    options = list(NETCONVERT_OPTIONS if options is None else options)
+    cached = None
+    if cache_dir:
+        os.makedirs(cache_dir, exist_ok=True)
+        cached = os.path.join(cache_dir, network_hash(node_file, edge_file, options) + ".net.xml")
+        if os.path.exists(cached):
+            shutil.copyfile(cached, output_file)
+            print(f"✅ Reused cached network: {output_file}")
+            return True
+
     try:
-        # Use netconvert to create the network
         cmd = [
-            'netconvert',
-            '--node-files', 'simple_nodes.nod.xml',
-            '--edge-files', 'simple_edges.edg.xml', 
-            '--output-file', 'generated_network.net.xml',
-            '--no-turnarounds'
-        ]
+            netconvert_binary(),
+            '--node-files', node_file,
+            '--edge-files', edge_file,
+            '--output-file', cached or output_file,
+        ] + options
         
         result = subprocess.run(cmd, capture_output=True, text=True)
         
-        if result.returncode == 0:
-            print("✅ Successfully generated network: generated_network.net.xml")
-            return True
-        else:
+        if result.returncode != 0:
             print("❌ Error generating network:")
             print(result.stderr)
             return False
@@ -69,9 +162,52 @@ def generate_network():
         print(f"❌ Error running netconvert: {e}")
         return False
 
+    if cached:
+        shutil.copyfile(cached, output_file)
+    print(f"✅ Successfully generated network: {output_file}")
+    return True
+
+def generate_network(cache_dir=".netcache"):
+    """Use netconvert to generate the network"""
+    return build_network('simple_nodes.nod.xml', 'simple_edges.edg.xml',
+                         'generated_network.net.xml', cache_dir=cache_dir)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Generate SUMO networks")
+    layout = parser.add_mutually_exclusive_group()
+    layout.add_argument("--grid", metavar="RxC", help="rows x columns grid of signals, e.g. 10x10")
+    layout.add_argument("--arterial", type=int, metavar="N", help="arterial with N signals")
+    parser.add_argument("--output", default="generated_network.net.xml", help="network file to write")
+    parser.add_argument("--spacing", type=float, default=200, help="distance between junctions (m)")
+    parser.add_argument("--lanes", type=int, default=1, help="lanes per direction on main corridors")
+    parser.add_argument("--side-lanes", type=int, default=1, help="lanes per direction on side streets")
+    parser.add_argument("--speed", type=float, default=13.9, help="main corridor speed (m/s)")
+    parser.add_argument("--side-speed", type=float, default=10, help="side street speed (m/s)")
+    parser.add_argument("--tls-type", choices=TLS_TYPES, default="static", help="signal type")
+    parser.add_argument("--cache-dir", default=".netcache", help="netconvert output cache")
+    parser.add_argument("--no-cache", action="store_true", help="always run netconvert")
+    return parser.parse_args(argv)
+
 if __name__ == "__main__":
-    create_network_files()
-    if generate_network():
+    args = parse_args()
+    cache_dir = None if args.no_cache else args.cache_dir
+    
+    if args.grid or args.arterial:
+        base = args.output[:-len(".net.xml")] if args.output.endswith(".net.xml") else args.output
+        node_file, edge_file = base + ".nod.xml", base + ".edg.xml"
+        layout = dict(spacing=args.spacing, lanes=args.lanes, side_lanes=args.side_lanes,
+                      speed=args.speed, side_speed=args.side_speed, tls_type=args.tls_type)
+        if args.grid:
+            rows, cols = (int(n) for n in args.grid.lower().split("x"))
+            write_grid_files(rows, cols, node_file, edge_file, **layout)
+        else:
+            write_arterial_files(args.arterial, node_file, edge_file, **layout)
+        ok = build_network(node_file, edge_file, args.output, cache_dir=cache_dir)
+    else:
+        create_network_files()
+        ok = generate_network(cache_dir=cache_dir)
+    
+    if ok:
         print("🎉 Network generation completed!")
     else:
         print("💥 Network generation failed!")
\ No newline at end of file
@@ -0,0 +1,202 @@
+import argparse
+import heapq
+import math
+from xml.sax.saxutils import XMLGenerator
+import numpy as np
+from simulator_backend import add_sumo_tools_path
+
+VEHICLE_TYPES = {
+    "car": {"accel": "2.6", "decel": "4.5", "sigma": "0.5", "length": "5", "maxSpeed": "13.9"},
+    "truck": {"accel": "1.3", "decel": "4.5", "sigma": "0.5", "length": "10", "maxSpeed": "10"},
+}
+
+class DemandProfile:
+    """Time-varying network demand: a base rate with Gaussian peaks
+
+    rate(t) = base_rate * scale * (1 + sum((factor - 1) * exp(-(t - center)**2 / (2 * width**2))))
+    in vehicles per hour over the whole network. peaks is a list of
+    (center, width, factor) tuples in seconds, e.g. (1800, 600, 2.5) for a
+    morning peak at 2.5x the base rate.
+    """
+
+    def __init__(self, base_rate=1200, peaks=(), scale=1.0):
+        self.base_rate = base_rate
+        self.peaks = list(peaks)
+        self.scale = scale
+
+    def rate(self, time):
+        factor = 1.0
+        for center, width, peak in self.peaks:
+            factor += (peak - 1) * math.exp(-(time - center) ** 2 / (2 * width ** 2))
+        return self.base_rate * self.scale * max(factor, 0.0)
+
+class NetworkTopology:
+    """Origin/destination edges and their shortest routes, read with sumolib
+
+    Origins are edges nothing feeds into (network entries), destinations
+    are edges that lead nowhere (exits); both must allow passenger cars.
+    """
+
+    def __init__(self, net_file):
+        if not add_sumo_tools_path():
+            raise RuntimeError("Please set SUMO_HOME environment variable")
+        import sumolib
+
+        self.net = sumolib.net.readNet(net_file)
+        edges = [e for e in self.net.getEdges() if e.getFunction() != "internal" and e.allows("passenger")]
+        self.origins = [e for e in edges if not e.getIncoming()]
+        self.destinations = [e for e in edges if not e.getOutgoing()]
+        self.routes = self.find_routes()
+
+    def find_routes(self):
+        """{(origin, destination): [edge ids]} for every connected OD pair"""
+        routes = {}
+        for origin in self.origins:
+            for destination in self.destinations:
+                if destination.getToNode() == origin.getFromNode():
+                    continue  # Straight back where it came from
+                path, _ = self.net.getShortestPath(origin, destination)
+                if path:
+                    routes[(origin.getID(), destination.getID())] = [e.getID() for e in path]
+        return routes
+
+    def lane_length(self, edge_id, lane=0):
+        return self.net.getEdge(edge_id).getLane(lane).getLength()
+
+class RouteWriter:
+    """Incremental .rou.xml writer; elements go straight to the file"""
+
+    def __init__(self, f):
+        self.xml = XMLGenerator(f, "UTF-8", short_empty_elements=True)
+        self.xml.startDocument()
+        self.xml.startElement("routes", {})
+
+    def element(self, name, attrs, children=(), indent=1):
+        self.xml.characters("\n" + "    " * indent)
+        self.xml.startElement(name, attrs)
+        for child_name, child_attrs in children:
+            self.element(child_name, child_attrs, indent=indent + 1)
+        if children:
+            self.xml.characters("\n" + "    " * indent)
+        self.xml.endElement(name)
+
+    def close(self):
+        self.xml.characters("\n")
+        self.xml.endElement("routes")
+        self.xml.endDocument()
+
+def parse_peak(text):
+    """'center:width:factor' in seconds, e.g. '1800:600:2.5'"""
+    center, width, factor = (float(x) for x in text.split(":"))
+    return center, width, factor
+
+def parse_incident(text):
+    """'time:edge:duration[:lane]', e.g. '900:A_to_B:300'"""
+    parts = text.split(":")
+    return float(parts[0]), parts[1], float(parts[2]), int(parts[3]) if len(parts) > 3 else 0
+
+def generate_routes(net_file, output, profile=None, begin=0, end=3600, interval=60, seed=42,
+                    truck_share=0.1, incidents=(), od_weights=None):
+    """Write a route file of individual vehicles drawn from a time-varying OD demand
+
+    Each interval, the number of departures per OD pair is Poisson with mean
+    rate(t) * weight * interval / 3600, where the OD weights are random
+    (seeded) unless given. Departures are sorted per interval and written as
+    they are drawn, so memory is bounded by one interval, not by the
+    scenario size. Incidents are (time, edge, duration, lane) tuples that
+    stop a broken-down vehicle mid-lane. Returns the number of vehicles
+    written.
+    """
+    profile = profile or DemandProfile()
+    rng = np.random.default_rng(seed)
+    topology = NetworkTopology(net_file)
+    od_pairs = sorted(topology.routes)
+    if not od_pairs:
+        raise ValueError(f"No connected origin/destination pairs in {net_file}")
+
+    if od_weights is None:
+        weights = rng.gamma(2.0, size=len(od_pairs))
+    else:
+        weights = np.array([od_weights.get(pair, 0.0) for pair in od_pairs], dtype=float)
+    weights = weights / weights.sum()
+    route_ids = [f"{origin}__{destination}" for origin, destination in od_pairs]
+
+    pending = []  # Incident vehicles, merged into the departure order
+    for index, (time, edge, duration, lane) in enumerate(sorted(incidents)):
+        heapq.heappush(pending, (time, index, edge, duration, lane))
+
+    count = 0
+    with open(output, 'w', encoding="utf-8") as f:
+        writer = RouteWriter(f)
+        for type_id, attrs in VEHICLE_TYPES.items():
+            writer.element("vType", dict(id=type_id, **attrs))
+        for route_id, pair in zip(route_ids, od_pairs):
+            writer.element("route", {"id": route_id, "edges": " ".join(topology.routes[pair])})
+
+        for start in np.arange(begin, end, interval):
+            length = min(interval, end - start)
+            means = profile.rate(start + length / 2) * weights * length / 3600
+            counts = rng.poisson(means)
+            routes = np.repeat(np.arange(len(od_pairs)), counts)
+            departs = start + rng.uniform(0, length, size=len(routes))
+            trucks = rng.random(len(routes)) < truck_share
+            order = np.argsort(departs, kind="stable")
+
+            for i in order:
+                depart = departs[i]
+                while pending and pending[0][0] <= depart:
+                    count += write_incident(writer, topology, *heapq.heappop(pending))
+                writer.element("vehicle", {
+                    "id": f"veh{count}",
+                    "type": "truck" if trucks[i] else "car",
+                    "route": route_ids[routes[i]],
+                    "depart": f"{depart:.2f}",
+                    "departLane": "best",
+                    "departSpeed": "max",
+                })
+                count += 1
+        while pending:
+            count += write_incident(writer, topology, *heapq.heappop(pending))
+        writer.close()
+    return count
+
+def write_incident(writer, topology, time, index, edge, duration, lane):
+    """Broken-down vehicle that stops halfway along edge's lane for duration seconds"""
+    position = topology.lane_length(edge, lane) / 2
+    writer.element("vehicle", {
+        "id": f"incident{index}", "type": "car", "depart": f"{time:.2f}",
+        "departLane": str(lane), "departPos": "0",
+    }, children=[
+        ("route", {"edges": edge}),
+        ("stop", {"lane": f"{edge}_{lane}", "endPos": f"{position:.2f}", "duration": f"{duration:.0f}"}),
+    ])
+    return 1
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Generate time-varying route files from a network")
+    parser.add_argument("-n", "--net-file", default="generated_network.net.xml", help="SUMO network")
+    parser.add_argument("-o", "--output", default="demand_routes.rou.xml", help="route file to write")
+    parser.add_argument("--begin", type=float, default=0, help="first departure time (s)")
+    parser.add_argument("--end", type=float, default=3600, help="last departure time (s)")
+    parser.add_argument("--rate", type=float, default=1200, help="base network demand (veh/h)")
+    parser.add_argument("--scale", type=float, default=1.0, help="multiply all demand by this factor")
+    parser.add_argument("--peak", type=parse_peak, action="append", default=[],
+                        help="demand peak as center:width:factor (seconds), repeatable")
+    parser.add_argument("--incident", type=parse_incident, action="append", default=[],
+                        help="lane blockage as time:edge:duration[:lane], repeatable")
+    parser.add_argument("--interval", type=float, default=60, help="demand sampling interval (s)")
+    parser.add_argument("--truck-share", type=float, default=0.1, help="share of trucks")
+    parser.add_argument("--seed", type=int, default=42, help="random seed")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    profile = DemandProfile(args.rate, args.peak, args.scale)
+    count = generate_routes(
+        args.net_file, args.output, profile, begin=args.begin, end=args.end, interval=args.interval,
+        seed=args.seed, truck_share=args.truck_share, incidents=args.incident,
+    )
+    print(f"✅ Wrote {count} vehicles to {args.output}")
+
+if __name__ == "__main__":
+    main()
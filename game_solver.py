@@ -0,0 +1,168 @@
+import numpy as np
+from payoff import PayoffEngine, snap
+
+SOLVER_METHODS = ("best_response", "fictitious_play", "cooperative", "bargaining", "search")
+
+def decide_green_times(waits, vehicles, current, solver=None, method="best_response", payoff=None):
+    """New green times, shape (N,): the game solver's, or the smoothed proportional plan without one"""
+    if solver is not None:
+        return np.asarray(solver.solve(waits, vehicles, current, method=method), dtype=float)
+    payoff = payoff if payoff is not None else PayoffEngine()
+    return payoff.allocate(waits, vehicles, current)
+
+class GreenTimeGame:
+    """Green-time game with every traffic light in the network as a player
+
+    Player i choosing green time g_i receives d_i * log(g_i) - price * g_i,
+    where d_i is its demand and the congestion price rises with the total
+    green S handed out: price = D * S / (2 * B**2) for total demand D and
+    budget B = base_green * N. The social optimum of this game is the
+    proportional split B * d_i / D, i.e. what cooperative_decision does for
+    two intersections. Demand, clamps, smoothing and payoffs come from a
+    PayoffEngine, which scores whole batches of joint strategies at once.
+    """
+
+    def __init__(self, min_green=20, max_green=50, base_green=30, resolution=1.0,
+                 smoothing=0.3, max_rounds=200, payoff=None, samples=4096, seed=0):
+        self.payoff = payoff or PayoffEngine(base_green=base_green, min_green=min_green,
+                                             max_green=max_green, smoothing=smoothing)
+        self.min_green = self.payoff.min_green
+        self.max_green = self.payoff.max_green
+        self.base_green = self.payoff.base_green
+        self.max_rounds = max_rounds
+        self.samples = samples
+        self.seed = seed  # Seeds every sampled batch, so solves are reproducible
+        self.resolution = resolution
+        self.strategies = np.arange(self.min_green, self.max_green + resolution / 2, resolution, dtype=float)
+        self.log_strategies = np.log(self.strategies)
+
+    def demand(self, waits, vehicles):
+        """Demand per intersection, same weighting as cooperative_decision"""
+        return self.payoff.demand(waits, vehicles)
+
+    def price_factor(self, demand):
+        return self.payoff.price_factor(demand)[..., 0]
+
+    def utilities(self, demand, green):
+        """Payoff of every player for one joint green-time vector, shape (N,)"""
+        return self.payoff.utilities(demand, green)
+
+    def payoffs(self, demand, green):
+        """Payoff of each strategy for each player against the others' green, shape (N, K)"""
+        others = green.sum() - green
+        totals = others[:, None] + self.strategies[None, :]
+        return (demand[:, None] * self.log_strategies[None, :]
+                - self.price_factor(demand) * totals * self.strategies[None, :])
+
+    def best_response(self, demand, green):
+        """Simultaneous best response of every player to the others' green"""
+        return self.strategies[np.argmax(self.payoffs(demand, green), axis=1)]
+
+    def solve_best_response(self, demand, start):
+        """Sequential best-response dynamics; converges since the game has a potential"""
+        green = self.snap(start)
+        c = self.price_factor(demand)
+        for _ in range(self.max_rounds):
+            changed = False
+            for i in range(len(green)):
+                others = green.sum() - green[i]
+                row = demand[i] * self.log_strategies - c * (others + self.strategies) * self.strategies
+                choice = self.strategies[np.argmax(row)]
+                if choice != green[i]:
+                    green[i] = choice
+                    changed = True
+            if not changed:
+                break
+        return green
+
+    def solve_fictitious_play(self, demand, start):
+        """Every player best-responds to the empirical average of past play"""
+        belief = self.snap(start)
+        for round_index in range(1, self.max_rounds + 1):
+            response = self.best_response(demand, belief)
+            step = 1.0 / (round_index + 1)
+            new_belief = belief + step * (response - belief)
+            if np.max(np.abs(new_belief - belief)) < 1e-3:
+                belief = new_belief
+                break
+            belief = new_belief
+        return belief
+
+    def solve_cooperative(self, demand):
+        """Welfare-maximising split of the green budget, proportional to demand"""
+        return self.payoff.proportional(demand)
+
+    def solve_search(self, demand, start):
+        """Highest-welfare joint strategy out of a sampled batch, scored in one pass"""
+        green, _ = self.payoff.search(demand, self.strategies, current=start, samples=self.samples,
+                                      rng=self.seed)
+        return green
+
+    def solve_bargaining(self, demand, start):
+        """Nash bargaining solution with the Nash equilibrium as disagreement point
+
+        Maximises sum(log(u_i - u0_i)) over joint strategies that leave every
+        player strictly better off than at the equilibrium. The search
+        starts from the best of a batch (the path from the equilibrium to
+        the cooperative split plus seeded random joint strategies), then
+        applies the best feasible single-player move while one improves.
+        With no feasible joint strategy the equilibrium itself is returned.
+        """
+        disagreement = self.solve_best_response(demand, start)
+        u0 = self.utilities(demand, disagreement)
+        n = len(disagreement)
+
+        def nash_product(utilities):
+            # -inf wherever some player would not gain over the disagreement point
+            surplus = utilities - u0
+            feasible = (surplus > 0).all(axis=-1)
+            logs = np.log(np.where(surplus > 0, surplus, 1.0)).sum(axis=-1)
+            return np.where(feasible, logs, -np.inf)
+
+        steps = np.linspace(0, 1, 21)[:, None]
+        path = self.snap(disagreement + steps * (self.solve_cooperative(demand) - disagreement))
+        rng = np.random.default_rng(self.seed)
+        sampled = self.strategies[rng.integers(len(self.strategies), size=(self.samples, n))]
+        candidates = np.concatenate([path, sampled])
+        objective = nash_product(self.payoff.utilities(demand, candidates))
+        best = int(np.argmax(objective))
+        if not np.isfinite(objective[best]):
+            return disagreement
+        green = candidates[best].copy()
+        current = objective[best]
+
+        for _ in range(self.max_rounds * n):
+            objective = nash_product(self.payoff.deviations(demand, green, self.strategies))  # (N, K)
+            i, k = np.unravel_index(np.argmax(objective), objective.shape)
+            if objective[i, k] <= current + 1e-12:
+                break
+            green[i] = self.strategies[k]
+            current = objective[i, k]
+        return green
+
+    def snap(self, green):
+        """Round green times onto the strategy grid"""
+        return snap(np.asarray(green, dtype=float), self.strategies)
+
+    def solve(self, waits, vehicles, current, method="best_response"):
+        """Return smoothed new green times for every player, shape (N,)"""
+        current = np.asarray(current, dtype=float)
+        demand = self.demand(waits, vehicles)
+        if demand.sum() <= 0:
+            return current.copy()
+
+        if method == "best_response":
+            target = self.solve_best_response(demand, current)
+        elif method == "fictitious_play":
+            target = self.solve_fictitious_play(demand, current)
+        elif method == "cooperative":
+            target = self.solve_cooperative(demand)
+        elif method == "bargaining":
+            target = self.solve_bargaining(demand, current)
+        elif method == "search":
+            target = self.solve_search(demand, current)
+        else:
+            raise ValueError(f"Unknown solver method '{method}', expected one of {SOLVER_METHODS}")
+
+        # Smooth the transition
+        return self.payoff.smooth(current, target)
@@ -0,0 +1,135 @@
+# Context range around each lane (m). Range 0 silently drops some vehicles that
+# are on the lane; anything beyond the lane is ignored by looking vehicles up
+# by the lane's own ID list.
+CONTEXT_RANGE = 1.0
+
+class MetricsCollector:
+    """Collect intersection metrics from TraCI subscriptions in bulk"""
+
+    def __init__(self, tls_ids, api=None, index=None):
+        # traci is imported here, not at module level, so importing the collector stays cheap
+        import traci.constants as tc
+        if api is None:
+            import traci
+            api = traci
+        self.api = api
+        self.index = index
+        self.tls_ids = list(tls_ids)
+        self.controlled_lanes = {}
+        self.lanes = []
+        self.context_vars = [tc.VAR_SPEED, tc.VAR_WAITING_TIME]
+
+    def add_context_vars(self, variables):
+        """Subscribe extra vehicle variables around each lane, re-subscribing if already active"""
+        missing = [var for var in variables if var not in self.context_vars]
+        self.context_vars.extend(missing)
+        if missing and self.lanes:
+            self.subscribe()
+
+    def subscribe(self):
+        """Subscribe to the controlled lanes, also used again after loadState"""
+        import traci.constants as tc
+        if not self.lanes:
+            self.discover_lanes()
+
+        for lane in self.lanes:
+            self.api.lane.subscribe(lane, [
+                tc.LAST_STEP_VEHICLE_ID_LIST,
+                tc.LAST_STEP_VEHICLE_NUMBER,
+                tc.LAST_STEP_VEHICLE_HALTING_NUMBER,
+            ])
+            self.api.lane.subscribeContext(
+                lane, tc.CMD_GET_VEHICLE_VARIABLE, CONTEXT_RANGE, self.context_vars
+            )
+        for tls_id in self.tls_ids:
+            self.api.trafficlight.subscribe(tls_id, [tc.TL_CURRENT_PHASE])
+
+    def discover_lanes(self):
+        """Fetch the controlled-lane list once per TLS, from the network index if given"""
+        seen = set()
+        for tls_id in self.tls_ids:
+            # Keep duplicates: a lane appears once per controlled link and the
+            # per-call functions in cooperative_control count it that often
+            if self.index is not None:
+                lanes = self.index.controlled_lanes(tls_id)
+            else:
+                lanes = list(self.api.trafficlight.getControlledLanes(tls_id))
+            self.controlled_lanes[tls_id] = lanes
+            for lane in lanes:
+                if lane not in seen:
+                    seen.add(lane)
+                    self.lanes.append(lane)
+
+    def unsubscribe(self):
+        """Drop all lane subscriptions made by this collector"""
+        import traci.constants as tc
+        for lane in self.lanes:
+            self.api.lane.unsubscribe(lane)
+            self.api.lane.unsubscribeContext(lane, tc.CMD_GET_VEHICLE_VARIABLE, CONTEXT_RANGE)
+        for tls_id in self.tls_ids:
+            self.api.trafficlight.unsubscribe(tls_id)
+        self.controlled_lanes = {}
+        self.lanes = []
+
+    def collect(self):
+        """Return {tls_id: {"wait", "vehicles", "queue", "phase"}} for the last step"""
+        import traci.constants as tc
+        if not self.lanes:
+            self.subscribe()
+
+        lane_results = self.api.lane.getAllSubscriptionResults()
+        context_results = self.api.lane.getAllContextSubscriptionResults()
+        tls_results = self.api.trafficlight.getAllSubscriptionResults()
+
+        metrics = {}
+        for tls_id in self.tls_ids:
+            try:
+                total_wait = 0
+                stopped = 0
+                vehicle_count = 0
+                queue = 0
+
+                for lane in self.controlled_lanes[tls_id]:
+                    lane_vars = lane_results.get(lane)
+                    if lane_vars is None:
+                        # No step since subscribing yet: fall back to direct calls
+                        vehicles = self.api.lane.getLastStepVehicleIDs(lane)
+                        vehicle_count += self.api.lane.getLastStepVehicleNumber(lane)
+                        queue += self.api.lane.getLastStepHaltingNumber(lane)
+                    else:
+                        vehicles = lane_vars[tc.LAST_STEP_VEHICLE_ID_LIST]
+                        vehicle_count += lane_vars[tc.LAST_STEP_VEHICLE_NUMBER]
+                        queue += lane_vars[tc.LAST_STEP_VEHICLE_HALTING_NUMBER]
+
+                    context = context_results.get(lane) or {}
+                    for vehicle in vehicles:
+                        vehicle_vars = context.get(vehicle)
+                        if vehicle_vars is None:
+                            speed = self.api.vehicle.getSpeed(vehicle)
+                        else:
+                            speed = vehicle_vars[tc.VAR_SPEED]
+                        if speed < 0.1:  # Vehicle is stopped or very slow
+                            if vehicle_vars is None:
+                                wait_time = self.api.vehicle.getWaitingTime(vehicle)
+                            else:
+                                wait_time = vehicle_vars[tc.VAR_WAITING_TIME]
+                            total_wait += wait_time
+                            stopped += 1
+
+                tls_vars = tls_results.get(tls_id)
+                if tls_vars is None:
+                    phase = self.api.trafficlight.getPhase(tls_id)
+                else:
+                    phase = tls_vars[tc.TL_CURRENT_PHASE]
+
+                metrics[tls_id] = {
+                    "wait": total_wait / stopped if stopped > 0 else 0,
+                    "vehicles": vehicle_count,
+                    "queue": queue,
+                    "phase": phase,
+                }
+            except Exception as e:
+                print(f"❌ Error collecting metrics for {tls_id}: {e}")
+                metrics[tls_id] = {"wait": 0, "vehicles": 0, "queue": 0, "phase": -1}
+
+        return metrics
@@ -0,0 +1,112 @@
+import glob
+import json
+import os
+import numpy as np
+
+COLUMNS = {
+    "wait": np.float32,
+    "queue": np.int32,
+    "vehicles": np.int32,
+    "phase": np.int16,
+}
+
+class MetricsSink:
+    """Stream per-step, per-TLS samples to columnar .npy chunks with bounded memory
+
+    Samples are written into preallocated (chunk_size, n_tls) arrays; each
+    full chunk is flushed as one .npy file per column, e.g. wait_00003.npy.
+    Memory use stays at one chunk regardless of run length.
+    """
+
+    def __init__(self, directory, tls_ids, chunk_size=4096, interval=1):
+        self.directory = directory
+        self.tls_ids = list(tls_ids)
+        self.chunk_size = chunk_size
+        self.interval = interval
+        self.index = {tls_id: i for i, tls_id in enumerate(self.tls_ids)}
+        self.time = np.empty(chunk_size, dtype=np.float64)
+        self.columns = {
+            name: np.empty((chunk_size, len(self.tls_ids)), dtype=dtype)
+            for name, dtype in COLUMNS.items()
+        }
+        self.rows = 0
+        self.chunks = 0
+        self.samples = 0
+        os.makedirs(directory, exist_ok=True)
+        # Chunks of an earlier run in the same directory would be renumbered over only in part
+        for path in glob.glob(os.path.join(directory, "*_[0-9][0-9][0-9][0-9][0-9].npy")):
+            os.remove(path)
+        self.write_meta()
+
+    def write_meta(self):
+        meta = {
+            "tls_ids": self.tls_ids,
+            "columns": {name: np.dtype(dtype).name for name, dtype in COLUMNS.items()},
+            "chunk_size": self.chunk_size,
+            "chunks": self.chunks,
+            "samples": self.samples,
+        }
+        with open(os.path.join(self.directory, "meta.json"), 'w') as f:
+            json.dump(meta, f, indent=2)
+
+    def record(self, time, metrics):
+        """Buffer one sample from MetricsCollector.collect()"""
+        row = self.rows
+        self.time[row] = time
+        for tls_id, values in metrics.items():
+            col = self.index.get(tls_id)
+            if col is None:
+                continue
+            for name, column in self.columns.items():
+                column[row, col] = values[name]
+        self.advance()
+
+    def record_arrays(self, time, wait, queue, vehicles, phase):
+        """Buffer one sample given as arrays ordered like tls_ids"""
+        row = self.rows
+        self.time[row] = time
+        self.columns["wait"][row] = wait
+        self.columns["queue"][row] = queue
+        self.columns["vehicles"][row] = vehicles
+        self.columns["phase"][row] = phase
+        self.advance()
+
+    def advance(self):
+        self.rows += 1
+        self.samples += 1
+        if self.rows == self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        """Write the buffered rows as one chunk per column"""
+        if self.rows == 0:
+            return
+        suffix = f"{self.chunks:05d}.npy"
+        np.save(os.path.join(self.directory, "time_" + suffix), self.time[:self.rows])
+        for name, column in self.columns.items():
+            np.save(os.path.join(self.directory, f"{name}_" + suffix), column[:self.rows])
+        self.chunks += 1
+        self.rows = 0
+        self.write_meta()
+
+    def close(self):
+        self.flush()
+
+def load_metrics(directory, columns=None, mmap=True):
+    """Load a sink directory as {"tls_ids", "time", <column>: (samples, n_tls) array}"""
+    with open(os.path.join(directory, "meta.json")) as f:
+        meta = json.load(f)
+    mmap_mode = "r" if mmap else None
+
+    def load(name):
+        # Only the chunks this run's metadata lists, never stray files in the directory
+        paths = [os.path.join(directory, f"{name}_{chunk:05d}.npy") for chunk in range(meta["chunks"])]
+        if not paths:
+            return np.empty((0,), dtype=np.float64)
+        parts = [np.load(path, mmap_mode=mmap_mode) for path in paths]
+        return parts[0] if len(parts) == 1 else np.concatenate(parts)
+
+    data = {"tls_ids": meta["tls_ids"], "time": load("time")}
+    for name in columns or meta["columns"]:
+        data[name] = load(name)
+    return data
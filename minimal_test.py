@@ -1,39 +1,38 @@
+import argparse
 import os
-import sys
-import traci
+from simulator_backend import add_backend_argument, add_sumo_tools_path, get_backend
 
-def minimal_test():
-    if 'SUMO_HOME' in os.environ:
-        tools = os.path.join(os.environ['SUMO_HOME'], 'tools')
-        sys.path.append(tools)
-    else:
+def minimal_test(backend_name=None):
+    if not add_sumo_tools_path():
         print("Please set SUMO_HOME")
         return
 
-    # Create a very simple route file on the fly
-    with open('minimal_routes.rou.xml', 'w') as f:
-        f.write('''<routes>
+    # Create a very simple route file on first run only
+    if not os.path.exists('minimal_routes.rou.xml'):
+        with open('minimal_routes.rou.xml', 'w') as f:
+            f.write('''<routes>
     <vType id="car" length="5"/>
     <route id="r1" edges="west_in A_to_B B_to_east2"/>
     <vehicle id="v0" type="car" route="r1" depart="0"/>
 </routes>''')
 
-    sumoCmd = ["sumo-gui", "-n", "network.net.xml", "-r", "minimal_routes.rou.xml", "--start"]
+    backend = get_backend(backend_name)
     
     try:
-        traci.start(sumoCmd)
+        sim = backend.start(["-n", "network.net.xml", "-r", "minimal_routes.rou.xml"])
         print("SUMO started!")
         
         for step in range(100):
-            traci.simulationStep()
+            sim.simulationStep()
             if step % 10 == 0:
-                print(f"Step {step}, Vehicles: {traci.vehicle.getIDCount()}")
+                print(f"Step {step}, Vehicles: {sim.vehicle.getIDCount()}")
                 
-        traci.close()
+        backend.close()
         print("Success!")
         
     except Exception as e:
         print(f"Error: {e}")
 
 if __name__ == "__main__":
-    minimal_test()
\ No newline at end of file
+    parser = add_backend_argument(argparse.ArgumentParser(description="Run a single vehicle through the network"))
+    minimal_test(parser.parse_args().backend)
\ No newline at end of file
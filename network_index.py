@@ -0,0 +1,116 @@
+import os
+import pickle
+import xml.etree.ElementTree as ET
+from simulator_backend import add_sumo_tools_path
+from utils import file_hash
+
+INDEX_VERSION = 1
+
+class NetworkIndex:
+    """Edges, lanes and traffic-light links of a .net.xml, built once with sumolib
+
+    Everything is stored as plain dicts/lists of IDs so it pickles into a
+    small cache file next to the netconvert outputs; later runs load that
+    instead of re-parsing the network. The TLS tables mirror what TraCI
+    reports: controlled_links(tls)[i] is the tuple of (in lane, out lane,
+    via lane) for link index i, and controlled_lanes(tls) the matching
+    incoming lane per link index.
+    """
+
+    def __init__(self, net_file):
+        if not add_sumo_tools_path():
+            raise RuntimeError("Please set SUMO_HOME environment variable")
+        import sumolib
+
+        net = sumolib.net.readNet(net_file, withInternal=False)
+        self.net_file = net_file
+        self.edges = {}       # edge -> [lane ids]
+        self.successors = {}  # edge -> {edges reachable through a connection}
+        self.lanes = {}       # lane -> (edge, max speed, last shape segment)
+        self.tls = {}         # tls -> [[(in lane, out lane, via lane)] per link index]
+        for edge in net.getEdges():
+            if edge.getFunction() == "internal":
+                continue
+            edge_id = edge.getID()
+            self.edges[edge_id] = [lane.getID() for lane in edge.getLanes()]
+            self.successors[edge_id] = {out.getID() for out in edge.getOutgoing()}
+            for lane in edge.getLanes():
+                self.lanes[lane.getID()] = (edge_id, lane.getSpeed(), tuple(lane.getShape()[-2:]))
+                for connection in lane.getOutgoing():
+                    tls_id = connection.getTLSID()
+                    if not tls_id:
+                        continue
+                    links = self.tls.setdefault(tls_id, [])
+                    index = connection.getTLLinkIndex()
+                    while len(links) <= index:
+                        links.append([])
+                    links[index].append(
+                        (lane.getID(), connection.getToLane().getID(), connection.getViaLaneID() or ""))
+
+    @classmethod
+    def load(cls, net_file, cache_dir=".netcache"):
+        """Load the index for net_file from cache_dir, building and caching it on a miss"""
+        digest = file_hash(net_file)
+        path = os.path.join(cache_dir, f"{os.path.basename(net_file)}.{digest}.index.pkl")
+        if os.path.exists(path):
+            try:
+                with open(path, 'rb') as f:
+                    version, index = pickle.load(f)
+                if version == INDEX_VERSION:
+                    index.net_file = net_file
+                    return index
+            except (OSError, pickle.UnpicklingError, EOFError, ValueError):
+                pass  # Rebuild below
+
+        index = cls(net_file)
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp_path = path + f".{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            pickle.dump((INDEX_VERSION, index), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+        return index
+
+    def controlled_links(self, tls_id):
+        return [tuple(links) for links in self.tls[tls_id]]
+
+    def controlled_lanes(self, tls_id):
+        """Incoming lane per link index, like trafficlight.getControlledLanes"""
+        return [links[0][0] for links in self.tls[tls_id] if links]
+
+    def incoming_edges(self, tls_id):
+        return sorted({self.lanes[lane][0] for lane in self.controlled_lanes(tls_id)})
+
+    def lane_speed(self, lane):
+        return self.lanes[lane][1]
+
+    def lane_end(self, lane):
+        """Last two shape points of a lane"""
+        return self.lanes[lane][2]
+
+    def validate_route(self, edges):
+        """List of problems with a route (unknown edges, missing connections); empty if valid"""
+        problems = [f"unknown edge '{edge}'" for edge in edges if edge not in self.edges]
+        if problems:
+            return problems
+        for current, following in zip(edges, edges[1:]):
+            if following not in self.successors[current]:
+                problems.append(f"no connection from '{current}' to '{following}'")
+        return problems
+
+    def validate_route_file(self, route_file):
+        """{route or vehicle id: problems} for every invalid route in a .rou.xml"""
+        invalid = {}
+        owner = None
+        for event, element in ET.iterparse(route_file, events=("start", "end")):
+            if event == "start":
+                if element.tag in ("vehicle", "flow", "trip"):
+                    owner = element.get("id")
+                continue
+            if element.tag == "route" and element.get("edges"):
+                problems = self.validate_route(element.get("edges").split())
+                if problems:
+                    invalid[element.get("id") or owner] = problems
+            elif element.tag in ("vehicle", "flow", "routes"):
+                owner = None
+                element.clear()  # Keep memory flat on large route files
+        return invalid
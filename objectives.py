@@ -0,0 +1,190 @@
+import numpy as np
+import traci.constants as tc
+
+# Vehicle variables the tracker adds to the collector's lane context subscriptions
+OBJECTIVE_VARS = [tc.VAR_CO2EMISSION, tc.VAR_FUELCONSUMPTION]
+
+# Objective -> 1 to minimise, -1 to maximise
+OBJECTIVES = {
+    "delay": 1,        # mean seconds halted per vehicle on the approach
+    "throughput": -1,  # vehicles leaving the approach per hour
+    "co2": 1,          # grams emitted on the approach per hour
+    "fuel": 1,         # grams burnt on the approach per hour
+    "stops": 1,        # moving -> halted transitions on the approach per hour
+    "fairness": -1,    # Jain index of per-vehicle delays, 1 = everyone waits the same
+}
+
+HALT_SPEED = 0.1
+
+def jain_index(total, squares, count):
+    """Jain fairness (sum x)**2 / (n * sum x**2), elementwise; 1 where nobody waited"""
+    total = np.asarray(total, dtype=float)
+    denominator = np.asarray(count, dtype=float) * squares
+    return np.divide(total * total, denominator, out=np.ones_like(total), where=denominator > 0)
+
+class ObjectiveTracker:
+    """Per-TLS throughput, emissions, stops and fairness from the collector's bulk subscriptions
+
+    Adds CO2 and fuel to the vehicle variables MetricsCollector already
+    subscribes around every controlled lane, so an update costs no TraCI
+    round trips. Each update flattens all vehicles on the approaches into
+    arrays and reduces them per TLS with np.bincount. A vehicle counts
+    towards throughput when it leaves its TLS's approach lanes; its
+    delay is the time it spent halted there. Call update() every step
+    (or pass the matching step_length) and reset() before each evaluation.
+    """
+
+    def __init__(self, collector, step_length=1.0):
+        self.collector = collector
+        self.api = collector.api
+        self.step_length = step_length
+        collector.add_context_vars(OBJECTIVE_VARS)
+        self.owner = None
+        self.reset()
+
+    def reset(self):
+        n = len(self.collector.tls_ids)
+        self.vehicles = {}  # vehicle -> (owner, halted seconds, moving)
+        self.passed = np.zeros(n)
+        self.co2 = np.zeros(n)
+        self.fuel = np.zeros(n)
+        self.stops = np.zeros(n)
+        self.delay = np.zeros(n)
+        self.delay_squares = np.zeros(n)
+        self.elapsed = 0.0
+
+    def lane_owners(self):
+        """{lane: TLS position}; a lane shared by two TLS belongs to the first"""
+        if self.owner is None:
+            if not self.collector.lanes:
+                self.collector.subscribe()
+            self.owner = {}
+            for position, tls_id in enumerate(self.collector.tls_ids):
+                for lane in self.collector.controlled_lanes[tls_id]:
+                    self.owner.setdefault(lane, position)
+        return self.owner
+
+    def update(self):
+        """Accumulate one step of subscription results"""
+        lane_results = self.api.lane.getAllSubscriptionResults()
+        context_results = self.api.lane.getAllContextSubscriptionResults()
+        dt = self.step_length
+        n = len(self.collector.tls_ids)
+
+        ids, owners, values = [], [], []
+        for lane, position in self.lane_owners().items():
+            lane_vars = lane_results.get(lane)
+            context = context_results.get(lane)
+            if lane_vars is None or not context:
+                continue
+            for vehicle in lane_vars[tc.LAST_STEP_VEHICLE_ID_LIST]:
+                vehicle_vars = context.get(vehicle)
+                if vehicle_vars is not None:
+                    ids.append(vehicle)
+                    owners.append(position)
+                    values.append((vehicle_vars[tc.VAR_SPEED], vehicle_vars[tc.VAR_CO2EMISSION],
+                                   vehicle_vars[tc.VAR_FUELCONSUMPTION]))
+
+        owner = np.array(owners, dtype=np.intp)
+        speed, co2, fuel = np.array(values, dtype=float).reshape(-1, 3).T
+        previous = self.vehicles
+        state = [previous.get(vehicle, (-1, 0.0, True)) for vehicle in ids]
+        same = np.array([s[0] for s in state], dtype=np.intp) == owner
+        halted = speed < HALT_SPEED
+        was_moving = np.where(same, np.array([s[2] for s in state], dtype=bool), True)
+        halted_time = np.where(same, np.array([s[1] for s in state], dtype=float), 0.0) + halted * dt
+
+        # mg/s over one step -> g
+        self.co2 += np.bincount(owner, co2, n) * dt / 1000
+        self.fuel += np.bincount(owner, fuel, n) * dt / 1000
+        self.stops += np.bincount(owner[halted & was_moving], minlength=n)
+
+        current = dict(zip(ids, zip(owner.tolist(), halted_time.tolist(), (~halted).tolist())))
+        left = [
+            (position, seconds) for vehicle, (position, seconds, _) in previous.items()
+            if current.get(vehicle, (-1,))[0] != position
+        ]
+        if left:
+            positions, seconds = np.array(left).T
+            positions = positions.astype(np.intp)
+            self.passed += np.bincount(positions, minlength=n)
+            self.delay += np.bincount(positions, seconds, n)
+            self.delay_squares += np.bincount(positions, seconds * seconds, n)
+        self.vehicles = current
+        self.elapsed += dt
+
+    def results(self):
+        """{tls_id: {objective: value}} since the last reset
+
+        Vehicles still on an approach count towards delay and fairness (a
+        starved approach must not look fair) but not throughput.
+        """
+        n = len(self.collector.tls_ids)
+        count, delay, squares = self.passed.copy(), self.delay.copy(), self.delay_squares.copy()
+        if self.vehicles:
+            positions, seconds, _ = np.array(list(self.vehicles.values()), dtype=float).T
+            positions = positions.astype(np.intp)
+            count += np.bincount(positions, minlength=n)
+            delay += np.bincount(positions, seconds, n)
+            squares += np.bincount(positions, seconds * seconds, n)
+
+        # Totals become rates, so evaluations of different length (early
+        # stopping) compare fairly
+        hours = self.elapsed / 3600
+
+        def per_hour(total):
+            return total / hours if hours > 0 else np.zeros(n)
+
+        columns = {
+            "delay": np.divide(delay, count, out=np.zeros(n), where=count > 0),
+            "throughput": per_hour(self.passed),
+            "co2": per_hour(self.co2),
+            "fuel": per_hour(self.fuel),
+            "stops": per_hour(self.stops),
+            "fairness": jain_index(delay, squares, count),
+        }
+        return {
+            tls_id: {name: float(column[i]) for name, column in columns.items()}
+            for i, tls_id in enumerate(self.collector.tls_ids)
+        }
+
+def network_objectives(averages):
+    """Network-wide objectives from per-TLS results: totals, mean delay and fairness"""
+    values = [metrics for metrics in averages.values() if "delay" in metrics]
+    if not values:
+        return {}
+    totals = {name: sum(metrics[name] for metrics in values) for name in OBJECTIVES}
+    totals["delay"] /= len(values)
+    totals["fairness"] /= len(values)
+    return totals
+
+def objective_matrix(objectives):
+    """(M, K) matrix to minimise, one row per {objective: value} dict"""
+    return np.array([[OBJECTIVES[name] * values[name] for name in OBJECTIVES] for values in objectives],
+                    dtype=float).reshape(len(objectives), len(OBJECTIVES))
+
+def pareto_front(points):
+    """Indices of the non-dominated rows of an (M, K) matrix to minimise"""
+    points = np.asarray(points, dtype=float)
+    no_worse = (points[:, None, :] <= points[None, :, :]).all(axis=-1)
+    better = (points[:, None, :] < points[None, :, :]).any(axis=-1)
+    dominated = (no_worse & better).any(axis=0)
+    return np.flatnonzero(~dominated)
+
+def choose(points, front, weights=None):
+    """Index of the front point with the lowest weighted sum of min-max normalised objectives"""
+    points = np.asarray(points, dtype=float)[front]
+    low, high = points.min(axis=0), points.max(axis=0)
+    span = np.where(high > low, high - low, 1.0)
+    weights = np.array([(weights or {}).get(name, 1.0) for name in OBJECTIVES])
+    return int(front[np.argmin(((points - low) / span) @ weights)])
+
+def parse_weights(text):
+    """'delay=2,co2=0.5' as {objective: weight}; objectives left out weigh 1"""
+    weights = {}
+    for item in text.split(","):
+        name, value = item.split("=")
+        if name not in OBJECTIVES:
+            raise ValueError(f"Unknown objective '{name}', expected one of {list(OBJECTIVES)}")
+        weights[name] = float(value)
+    return weights
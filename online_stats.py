@@ -0,0 +1,256 @@
+import math
+import numpy as np
+
+# Two-sided standard normal quantiles for the early-stopping confidence levels
+Z_SCORES = {0.8: 1.282, 0.9: 1.645, 0.95: 1.960, 0.99: 2.576}
+
+class RunningStats:
+    """Weighted online mean and variance per column (West's form of Welford's update)
+
+    Weights are the simulated time each sample stands for, so sparse and
+    dense samples count in proportion; with equal weights the mean is the
+    plain sum/len and the variance the usual n-1 estimate.
+    """
+
+    def __init__(self, n=1):
+        self.count = 0
+        self.weight = 0.0
+        self.weight_squares = 0.0
+        self.mean = np.zeros(n)
+        self.m2 = np.zeros(n)
+
+    def update(self, values, weight=1.0):
+        values = np.asarray(values, dtype=float)
+        self.count += 1
+        self.weight += weight
+        self.weight_squares += weight * weight
+        delta = values - self.mean
+        self.mean += delta * (weight / self.weight)
+        self.m2 += weight * delta * (values - self.mean)
+
+    @property
+    def effective_count(self):
+        """Kish's effective sample size W**2 / sum(w**2)"""
+        return self.weight * self.weight / self.weight_squares if self.weight_squares else 0.0
+
+    @property
+    def variance(self):
+        denominator = self.weight - self.weight_squares / self.weight if self.weight else 0.0
+        if denominator <= 0:
+            return np.zeros_like(self.mean)
+        return self.m2 / denominator
+
+    @property
+    def std(self):
+        return np.sqrt(self.variance)
+
+    def half_width(self, confidence=0.95):
+        """Half width of the normal confidence interval on the mean"""
+        if self.count < 2:
+            return np.full_like(self.mean, np.inf)
+        return Z_SCORES[confidence] * np.sqrt(self.variance / self.effective_count)
+
+class Ewma:
+    """Exponentially weighted moving average per column, seeded with the first sample
+
+    alpha applies per step; a sample taken `steps` steps after the previous
+    one decays the old value by (1 - alpha) ** steps, so irregular sampling
+    keeps the same time constant.
+    """
+
+    def __init__(self, alpha=0.3):
+        self.alpha = alpha
+        self.value = None
+
+    def update(self, values, steps=1):
+        values = np.asarray(values, dtype=float)
+        if self.value is None:
+            self.value = values.copy()
+        else:
+            self.value += (1 - (1 - self.alpha) ** steps) * (values - self.value)
+        return self.value
+
+class P2Quantile:
+    """Streaming quantile per column in O(1) memory (Jain & Chlamtac's P-square sketch)
+
+    Five markers per column track the minimum, the quantile, the maximum
+    and two points halfway to them; each update moves the marker positions
+    and nudges the heights with a piecewise-parabolic fit, for all columns
+    at once. Until five samples have arrived the quantile comes from the
+    samples themselves.
+    """
+
+    def __init__(self, quantile=0.9, n=1):
+        self.quantile = quantile
+        self.n = n
+        q = quantile
+        self.increments = np.array([0, q / 2, q, (1 + q) / 2, 1])[:, None]
+        self.first = []
+        self.heights = None
+        self.positions = None
+        self.desired = None
+
+    def update(self, values):
+        values = np.asarray(values, dtype=float).reshape(self.n)
+        if self.heights is None:
+            self.first.append(values)
+            if len(self.first) == 5:
+                q = self.quantile
+                self.heights = np.sort(np.array(self.first), axis=0)
+                self.positions = np.tile(np.arange(1.0, 6.0)[:, None], (1, self.n))
+                self.desired = np.tile(np.array([1, 1 + 2 * q, 1 + 4 * q, 3 + 2 * q, 5])[:, None], (1, self.n))
+                self.first = []
+            return
+
+        h, p = self.heights, self.positions
+        h[0] = np.minimum(h[0], values)
+        h[4] = np.maximum(h[4], values)
+        cell = (values[None, :] >= h[1:4]).sum(axis=0)
+        p += np.arange(5)[:, None] > cell[None, :]
+        self.desired += self.increments
+
+        for i in (1, 2, 3):
+            offset = self.desired[i] - p[i]
+            move = ((offset >= 1) & (p[i + 1] - p[i] > 1)) | ((offset <= -1) & (p[i - 1] - p[i] < -1))
+            if not move.any():
+                continue
+            s = np.sign(offset)
+            parabolic = h[i] + s / (p[i + 1] - p[i - 1]) * (
+                (p[i] - p[i - 1] + s) * (h[i + 1] - h[i]) / (p[i + 1] - p[i])
+                + (p[i + 1] - p[i] - s) * (h[i] - h[i - 1]) / (p[i] - p[i - 1])
+            )
+            neighbour_h = np.where(s > 0, h[i + 1], h[i - 1])
+            neighbour_p = np.where(s > 0, p[i + 1], p[i - 1])
+            linear = h[i] + s * (neighbour_h - h[i]) / (neighbour_p - p[i])
+            height = np.where((h[i - 1] < parabolic) & (parabolic < h[i + 1]), parabolic, linear)
+            h[i] = np.where(move, height, h[i])
+            p[i] = np.where(move, p[i] + s, p[i])
+
+    @property
+    def value(self):
+        if self.heights is not None:
+            return self.heights[2].copy()
+        if not self.first:
+            return np.zeros(self.n)
+        return np.quantile(np.array(self.first), self.quantile, axis=0)
+
+class AdaptiveSampler:
+    """Steps until the next metrics sample, from how far the queues drift from their mean
+
+    Queues swing through every signal cycle, so a single reading says
+    little; instead a fast EWMA (time_constant steps, about a cycle) of the
+    halting counts is compared with their mean and spread since the
+    evaluation started. When any TLS's EWMA is more than `threshold`
+    standard deviations (at least min_queue vehicles) away, traffic is
+    surging or draining and the interval halves down to min_interval;
+    otherwise it grows by half up to max_interval. The first `warmup`
+    samples keep the starting interval while the spread is estimated.
+    """
+
+    def __init__(self, interval=10, min_interval=2, max_interval=30, threshold=1.0, min_queue=5,
+                 time_constant=30, warmup=5):
+        self.base_interval = interval
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.threshold = threshold
+        self.min_queue = min_queue
+        self.alpha = 1 - math.exp(-1 / time_constant)
+        self.warmup = warmup
+        self.reset()
+
+    def reset(self):
+        self.interval = self.base_interval
+        self.fast = Ewma(self.alpha)
+        self.queues = None
+
+    def next_interval(self, queues):
+        """Interval to the next sample after observing these queues"""
+        queues = np.asarray(queues, dtype=float)
+        if self.queues is None:
+            self.queues = RunningStats(len(queues))
+        self.queues.update(queues, self.interval)
+        self.fast.update(queues, self.interval)
+        if self.queues.count > self.warmup:
+            spread = np.maximum(self.queues.std, self.min_queue)
+            drift = np.abs(self.fast.value - self.queues.mean) / spread
+            if drift.max(initial=0) > self.threshold:
+                self.interval = max(self.min_interval, self.interval // 2)
+            else:
+                self.interval = min(self.max_interval, self.interval + max(1, self.interval // 2))
+        return self.interval
+
+class ConfidenceStop:
+    """Stop an evaluation once the confidence interval on its score is tight enough
+
+    The score is the network total wait that candidates are ranked by.
+    Stops when at least min_samples samples and min_steps steps are in and
+    the interval's half width is within `tolerance` of the mean (relative)
+    or `absolute` seconds. Consecutive samples are correlated, so the
+    interval is optimistic; the minimums keep a short lucky run from
+    ending an evaluation.
+    """
+
+    def __init__(self, tolerance=0.05, confidence=0.95, min_samples=10, min_steps=60, absolute=0.5):
+        if confidence not in Z_SCORES:
+            raise ValueError(f"Unsupported confidence {confidence}, expected one of {sorted(Z_SCORES)}")
+        self.tolerance = tolerance
+        self.confidence = confidence
+        self.min_samples = min_samples
+        self.min_steps = min_steps
+        self.absolute = absolute
+
+    def done(self, stats, steps):
+        """Whether RunningStats over the score have converged after `steps` steps"""
+        if stats.count < self.min_samples or steps < self.min_steps:
+            return False
+        half_width = float(stats.half_width(self.confidence)[0])
+        return half_width <= max(self.tolerance * abs(float(stats.mean[0])), self.absolute)
+
+class EvaluationStats:
+    """Incremental aggregates for one plan evaluation, one column per TLS
+
+    Replaces collecting every sample in lists: mean and variance of wait
+    and vehicles, the mean queue and its EWMA, and a wait percentile
+    sketch, plus the running network total wait for early stopping.
+    """
+
+    def __init__(self, tls_ids, quantile=0.9, alpha=0.05):
+        self.tls_ids = list(tls_ids)
+        n = len(self.tls_ids)
+        self.quantile = quantile
+        self.wait = RunningStats(n)
+        self.vehicles = RunningStats(n)
+        self.queue = RunningStats(n)
+        self.queue_ewma = Ewma(alpha)
+        self.wait_quantile = P2Quantile(quantile, n)
+        self.total_wait = RunningStats(1)
+
+    def update(self, metrics, weight=1.0):
+        """Add one MetricsCollector.collect() sample standing for `weight` steps"""
+        waits = np.array([metrics[tls_id]["wait"] for tls_id in self.tls_ids], dtype=float)
+        vehicles = np.array([metrics[tls_id]["vehicles"] for tls_id in self.tls_ids], dtype=float)
+        queues = np.array([metrics[tls_id]["queue"] for tls_id in self.tls_ids], dtype=float)
+        self.wait.update(waits, weight)
+        self.vehicles.update(vehicles, weight)
+        self.queue.update(queues, weight)
+        self.queue_ewma.update(queues, weight)
+        self.wait_quantile.update(waits)
+        self.total_wait.update([waits.sum()], weight)
+        return queues
+
+    def averages(self):
+        """{tls_id: {"wait", "vehicles", ...}}; zeros when nothing was sampled"""
+        if not self.wait.count:
+            return {tls_id: {"wait": 0, "vehicles": 0} for tls_id in self.tls_ids}
+        columns = {
+            "wait": self.wait.mean,
+            "vehicles": self.vehicles.mean,
+            "wait_std": self.wait.std,
+            f"wait_p{round(self.quantile * 100)}": self.wait_quantile.value,
+            "queue": self.queue.mean,
+            "queue_ewma": self.queue_ewma.value,
+        }
+        return {
+            tls_id: {name: float(column[i]) for name, column in columns.items()}
+            for i, tls_id in enumerate(self.tls_ids)
+        }
@@ -0,0 +1,167 @@
+import multiprocessing
+import os
+import shutil
+import tempfile
+from simulator_backend import get_backend
+
+def candidate_args(task):
+    """SUMO arguments for one candidate task"""
+    sumo_args = [
+        "-c", task["config_file"],
+        "--seed", str(task["seed"]),
+        "--no-step-log", "--no-warnings",
+    ]
+    return sumo_args
+
+def evaluate_on(backend, task, start):
+    """Run one candidate on backend, (re)started by start(sumo_args); the caller closes it"""
+    # Imported here so worker processes do not import the controller at fork time
+    from cooperative_control import CooperativeTrafficControl
+
+    controller = CooperativeTrafficControl(backend)
+    controller.verbose = False
+    controller.multi_objective = task["objectives"]
+    controller.adaptive_sampling = task["adaptive_sampling"]
+    controller.early_stop = task["early_stop"]
+    controller.green_times = dict(task["green_times"])
+
+    try:
+        sim = start(candidate_args(task))
+        if task["state_file"]:
+            # Start from a saved state instead of re-simulating the warm-up.
+            # The state refers to the cooperative programs installed in the
+            # live run, which must exist before it loads (--load-state is
+            # read too early for that)
+            for tls_id, green_time in task["green_times"].items():
+                controller.set_traffic_light_phases(tls_id, green_time)
+            sim.simulation.loadState(task["state_file"])
+        for _ in range(task["warmup_steps"]):
+            sim.simulationStep()
+        averages = controller.evaluate_plan(
+            evaluation_steps=task["evaluation_steps"],
+            sample_interval=task["sample_interval"],
+        )
+        error = None
+    except Exception as e:
+        averages = {}
+        error = str(e)
+
+    return {
+        "index": task["index"],
+        "green_times": task["green_times"],
+        "seed": task["seed"],
+        "metrics": averages,
+        "total_wait": sum(m["wait"] for m in averages.values()) if averages else float('inf'),
+        "steps": controller.last_evaluation["steps"] if controller.last_evaluation else 0,
+        "error": error,
+    }
+
+def evaluate_candidate(task):
+    """Run one candidate plan in its own headless simulation (pool worker)"""
+    backend = get_backend(task["backend"], port=task["port"], label=f"candidate_{task['index']}")
+    try:
+        return evaluate_on(backend, task, backend.start)
+    finally:
+        backend.close()
+
+class ParallelEvaluator:
+    """Evaluate batches of green-time plans across a pool of SUMO workers
+
+    By default the workers keep their SUMO instances warm between batches
+    (SimulatorPool); warm=False starts a fresh simulation per candidate,
+    and pool_address sends batches to a running simulator_pool.py service.
+    Given the live simulation's api, every batch starts from its current
+    state (saved with saveState; start SUMO with --save-state.rng), and all
+    candidates of a batch share one seed so they see the same traffic.
+    """
+
+    def __init__(self, config_file, backend="sumo", workers=None, evaluation_steps=300,
+                 sample_interval=10, warmup_steps=0, base_seed=42, base_port=None, state_file=None,
+                 objectives=False, warm=True, pool_address=None, adaptive_sampling=False, early_stop=None,
+                 api=None, min_time=100):
+        if backend == "sumo-gui":
+            backend = "sumo"  # Workers always run headless
+        self.config_file = config_file
+        self.backend = backend
+        self.workers = workers or os.cpu_count() or 1
+        self.evaluation_steps = evaluation_steps
+        self.sample_interval = sample_interval
+        self.warmup_steps = warmup_steps
+        self.base_seed = base_seed
+        self.base_port = base_port
+        self.state_file = state_file
+        self.objectives = objectives
+        self.adaptive_sampling = adaptive_sampling
+        self.early_stop = early_stop
+        self.warm = warm
+        self.pool_address = pool_address
+        self.pool = None
+        self.api = api
+        self.min_time = min_time
+        self.state_dir = None
+
+    def tasks(self, candidates):
+        for index, green_times in enumerate(candidates):
+            yield {
+                "index": index,
+                "green_times": dict(green_times),
+                # Absolute, so a pool service started elsewhere finds it
+                "config_file": os.path.abspath(self.config_file),
+                "backend": self.backend,
+                # None lets traci pick a free port per instance
+                "port": self.base_port + index if self.base_port else None,
+                # Common random numbers: plans differ, the traffic does not
+                "seed": self.base_seed,
+                "state_file": self.state_file,
+                "warmup_steps": self.warmup_steps,
+                "evaluation_steps": self.evaluation_steps,
+                "sample_interval": self.sample_interval,
+                "objectives": self.objectives,
+                "adaptive_sampling": self.adaptive_sampling,
+                "early_stop": self.early_stop,
+            }
+
+    def snapshot(self):
+        """Save the live simulation's state for the next batch to start from"""
+        sim = self.api
+        # States saved while flows are still starting up do not restore
+        # pending insertions reliably, so never snapshot before min_time
+        while sim.simulation.getTime() < self.min_time:
+            sim.simulationStep()
+        if self.state_dir is None:
+            self.state_dir = tempfile.mkdtemp(prefix="candidates_")
+        self.state_file = os.path.join(self.state_dir, "live_state.xml")
+        sim.simulation.saveState(self.state_file)
+        return self.state_file
+
+    def evaluate(self, candidates):
+        """Return one result dict per candidate, in candidate order"""
+        if self.api is not None:
+            self.snapshot()
+        tasks = list(self.tasks(candidates))
+        if self.pool_address or self.warm:
+            if self.pool is None:
+                from simulator_pool import PoolClient, SimulatorPool
+                if self.pool_address:
+                    self.pool = PoolClient(self.pool_address)
+                else:
+                    self.pool = SimulatorPool(self.workers, self.backend, self.base_port)
+            results = self.pool.map(tasks)
+        else:
+            processes = min(self.workers, len(tasks)) or 1
+            with multiprocessing.Pool(processes=processes) as pool:
+                results = list(pool.imap_unordered(evaluate_candidate, tasks, chunksize=1))
+
+        results.sort(key=lambda result: result["index"])
+        for result in results:
+            if result["error"]:
+                print(f"❌ Candidate {result['index']} failed: {result['error']}")
+        return results
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.close()
+            self.pool = None
+        if self.state_dir is not None:
+            shutil.rmtree(self.state_dir, ignore_errors=True)
+            self.state_dir = None
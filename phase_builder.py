@@ -0,0 +1,102 @@
+class PhaseProgramBuilder:
+    """Derive main/side phase states per TLS from its controlled links
+
+    Links are grouped by the axis (east-west or north-south) of their incoming
+    lane; the axis with the fastest approach is the main corridor. States are
+    computed once per TLS and Logic objects are cached per green time
+    (rounded to 0.1 s), so repeated iterations reuse them. With a
+    NetworkIndex, links, speeds and shapes come from it instead of TraCI.
+    """
+
+    def __init__(self, api, index=None):
+        self.api = api
+        self.index = index
+        self.states = {}
+        self.logics = {}
+
+    def lane_axis(self, lane):
+        """'ew' or 'ns' from the direction of the lane's last shape segment"""
+        if self.index is not None:
+            shape = self.index.lane_end(lane)
+        else:
+            shape = self.api.lane.getShape(lane)
+        (x1, y1), (x2, y2) = shape[-2], shape[-1]
+        return "ew" if abs(x2 - x1) >= abs(y2 - y1) else "ns"
+
+    def build_states(self, tls_id):
+        """Compute main/side green and yellow state strings for one TLS"""
+        if self.index is not None:
+            links = self.index.controlled_links(tls_id)
+            lane_speed = self.index.lane_speed
+        else:
+            links = self.api.trafficlight.getControlledLinks(tls_id)
+            lane_speed = self.api.lane.getMaxSpeed
+        speeds = {}
+        groups = {"ew": [], "ns": []}
+        for index, connections in enumerate(links):
+            if not connections:
+                continue  # Unused link index, stays red
+            in_lane = connections[0][0]
+            if in_lane not in speeds:
+                speeds[in_lane] = lane_speed(in_lane)
+            groups[self.lane_axis(in_lane)].append(index)
+
+        def group_speed(indices):
+            return max((speeds[links[i][0][0]] for i in indices), default=-1)
+
+        if groups["ew"] and groups["ns"]:
+            main_axis = max(groups, key=lambda axis: (group_speed(groups[axis]), len(groups[axis])))
+            main = groups[main_axis]
+            side = groups["ns" if main_axis == "ew" else "ew"]
+        else:
+            # Single-axis junction: split by incoming lane, fastest approach first
+            indices = groups["ew"] or groups["ns"]
+            lanes = sorted({links[i][0][0] for i in indices}, key=lambda lane: -speeds[lane])
+            main_lanes = set(lanes[:max(1, len(lanes) // 2)])
+            main = [i for i in indices if links[i][0][0] in main_lanes]
+            side = [i for i in indices if links[i][0][0] not in main_lanes]
+
+        def green_state(indices):
+            state = ["r"] * len(links)
+            # Only one priority ('G') link per target lane, the rest yield ('g')
+            by_target = {}
+            for i in sorted(indices, key=lambda i: -speeds[links[i][0][0]]):
+                out_lane = links[i][0][1]
+                state[i] = "g" if out_lane in by_target else "G"
+                by_target.setdefault(out_lane, i)
+            return "".join(state)
+
+        main_green = green_state(main)
+        side_green = green_state(side)
+        return {
+            "main_green": main_green,
+            "main_yellow": main_green.replace("G", "y").replace("g", "y"),
+            "side_green": side_green,
+            "side_yellow": side_green.replace("G", "y").replace("g", "y"),
+        }
+
+    def get_states(self, tls_id):
+        if tls_id not in self.states:
+            self.states[tls_id] = self.build_states(tls_id)
+        return self.states[tls_id]
+
+    def get_logic(self, tls_id, green_time, yellow_time):
+        """Cached four-phase Logic: main green, main yellow, side green, side yellow"""
+        key = (tls_id, round(green_time, 1), round(yellow_time, 1))
+        if key not in self.logics:
+            states = self.get_states(tls_id)
+            green, yellow = key[1], key[2]
+            Phase = self.api.trafficlight.Phase
+            phases = [
+                Phase(green, states["main_green"], 0, 0),
+                Phase(yellow, states["main_yellow"], 0, 0),
+                Phase(green, states["side_green"], 0, 0),
+                Phase(yellow, states["side_yellow"], 0, 0),
+            ]
+            self.logics[key] = self.api.trafficlight.Logic(
+                programID=f"cooperative_{tls_id}",
+                type=0,
+                currentPhaseIndex=0,
+                phases=phases
+            )
+        return self.logics[key]
@@ -0,0 +1,114 @@
+import math
+import sqlite3
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS plans (
+    network TEXT NOT NULL,
+    tls TEXT NOT NULL,
+    bucket INTEGER NOT NULL,
+    signature INTEGER NOT NULL,
+    demand REAL NOT NULL,
+    green REAL NOT NULL,
+    total_wait REAL,
+    iterations INTEGER,
+    updated REAL NOT NULL,
+    used REAL NOT NULL,
+    PRIMARY KEY (network, tls, bucket, signature)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS plans_used ON plans (used);
+"""
+
+class PlanStore:
+    """Persistent green-time plans keyed by network, TLS, time of day and demand
+
+    A plan is stored per (network hash, TLS id, time-of-day bucket, demand
+    signature); the signature is the demand level in half-octaves
+    (round(2 * log2(1 + demand))), so similar traffic shares an entry.
+    lookup() returns the closest stored plan: nearest bucket on the 24 h
+    clock first, then nearest demand. Entries unused for max_age_days, and
+    the least recently used ones beyond max_entries, are evicted.
+    """
+
+    def __init__(self, path="plans.sqlite", bucket_seconds=900, max_age_days=30, max_entries=100000):
+        self.path = path
+        self.bucket_seconds = bucket_seconds
+        self.buckets = int(86400 // bucket_seconds)
+        self.max_age_days = max_age_days
+        self.max_entries = max_entries
+        self.db = sqlite3.connect(path)
+        self.db.executescript(SCHEMA)
+        self.evict()
+
+    def bucket(self, seconds):
+        """Time-of-day bucket for seconds after midnight (wraps every 24 h)"""
+        return int(seconds % 86400 // self.bucket_seconds)
+
+    @staticmethod
+    def signature(demand):
+        return int(round(2 * math.log2(1 + max(demand, 0.0))))
+
+    def lookup(self, network, tls_id, bucket, demand=None):
+        """Closest stored green time for one TLS, or None"""
+        rows = self.db.execute(
+            "SELECT bucket, signature, demand, green FROM plans WHERE network = ? AND tls = ?",
+            (network, tls_id),
+        ).fetchall()
+        if not rows:
+            return None
+
+        def distance(row):
+            offset = abs(row[0] - bucket)
+            clock = min(offset, self.buckets - offset)
+            return (clock, abs(row[2] - demand) if demand is not None else 0.0)
+
+        best = min(rows, key=distance)
+        self.db.execute(
+            "UPDATE plans SET used = ? WHERE network = ? AND tls = ? AND bucket = ? AND signature = ?",
+            (time.time(), network, tls_id, best[0], best[1]),
+        )
+        self.db.commit()
+        return best[3]
+
+    def warm_start(self, network, green_times, seconds, demands=None):
+        """Replace green_times entries with stored plans where one exists; return how many"""
+        bucket = self.bucket(seconds)
+        found = 0
+        for tls_id in green_times:
+            demand = demands.get(tls_id) if demands else None
+            green = self.lookup(network, tls_id, bucket, demand)
+            if green is not None:
+                green_times[tls_id] = green
+                found += 1
+        return found
+
+    def save(self, network, green_times, seconds, demands, total_wait=None, iterations=None):
+        """Write back a converged plan for every TLS"""
+        bucket = self.bucket(seconds)
+        now = time.time()
+        self.db.executemany(
+            "INSERT OR REPLACE INTO plans VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [
+                (network, tls_id, bucket, self.signature(demands.get(tls_id, 0.0)),
+                 float(demands.get(tls_id, 0.0)), float(green), total_wait, iterations, now, now)
+                for tls_id, green in green_times.items()
+            ],
+        )
+        self.db.commit()
+        self.evict()
+
+    def evict(self):
+        """Drop entries unused for max_age_days, then the least recently used beyond max_entries"""
+        cutoff = time.time() - self.max_age_days * 86400
+        self.db.execute("DELETE FROM plans WHERE used < ?", (cutoff,))
+        self.db.execute(
+            "DELETE FROM plans WHERE used <= (SELECT used FROM plans ORDER BY used DESC LIMIT 1 OFFSET ?)",
+            (self.max_entries,),
+        )
+        self.db.commit()
+
+    def __len__(self):
+        return self.db.execute("SELECT COUNT(*) FROM plans").fetchone()[0]
+
+    def close(self):
+        self.db.close()
@@ -0,0 +1,195 @@
+import io
+import json
+import os
+import time
+from collections import Counter
+from contextlib import nullcontext
+
+DOMAINS = (
+    "simulation", "trafficlight", "lane", "vehicle", "edge", "junction", "route",
+    "vehicletype", "person", "inductionloop", "lanearea", "multientryexit", "poi", "polygon",
+)
+
+class CountingApi:
+    """Proxy around the traci/libsumo module that counts calls per function"""
+
+    def __init__(self, api, calls=None, prefix=""):
+        self._api = api
+        self._prefix = prefix
+        self.calls = calls if calls is not None else Counter()
+
+    def __getattr__(self, name):
+        attr = getattr(self._api, name)
+        if not self._prefix and name in DOMAINS:
+            wrapped = CountingApi(attr, self.calls, prefix=name + ".")
+        elif callable(attr) and not isinstance(attr, type):
+            key = self._prefix + name
+            calls = self.calls
+
+            def wrapped(*args, **kwargs):
+                calls[key] += 1
+                return attr(*args, **kwargs)
+        else:
+            return attr
+        # Cache so later lookups skip __getattr__
+        setattr(self, name, wrapped)
+        return wrapped
+
+    def total(self):
+        return sum(self.calls.values())
+
+class Stage:
+    """Timer for one named stage, used as a context manager"""
+    __slots__ = ("profiler", "name", "start")
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler.record(self.name, self.start, time.perf_counter_ns())
+        return False
+
+_NULL_STAGE = nullcontext()
+
+class Profiler:
+    """Per-stage timers, TraCI call counts and optional cProfile/tracemalloc capture
+
+    Code marks its stages with `with profiler.stage("step"):`. Disabled,
+    stage() returns one shared no-op context manager, so instrumented loops
+    cost a method call per stage and nothing else. Enabled, stage times and
+    TraCI calls are summed per iteration (begin_iteration/end_iteration)
+    and, with trace=True, kept as events for export_chrome_trace().
+    """
+
+    def __init__(self, enabled=False, trace=False, cprofile=False, memory=False, max_events=1000000):
+        self.enabled = enabled or trace or cprofile or memory
+        self.trace = trace
+        self.max_events = max_events
+        self.calls = Counter()
+        self.stages = {}
+        self.iterations = []
+        self.events = []
+        self.counters = []
+        self.label = None
+        self.iteration_start = None
+        self.iteration_calls = 0
+        self.origin = time.perf_counter_ns()
+        self.cprofile = None
+        if cprofile:
+            import cProfile
+            self.cprofile = cProfile.Profile()
+        self.memory = memory
+        self.tracemalloc = None
+        if memory:
+            import tracemalloc
+            self.tracemalloc = tracemalloc
+
+    def stage(self, name):
+        if not self.enabled:
+            return _NULL_STAGE
+        return Stage(self, name)
+
+    def record(self, name, start, end):
+        entry = self.stages.get(name)
+        if entry is None:
+            entry = self.stages[name] = [0, 0]
+        entry[0] += end - start
+        entry[1] += 1
+        if self.trace and len(self.events) < self.max_events:
+            self.events.append((name, start, end, "stage"))
+
+    def instrument(self, api):
+        """Return api wrapped to count TraCI calls when enabled, else api itself"""
+        if not self.enabled:
+            return api
+        return CountingApi(api, self.calls)
+
+    def start(self):
+        if self.cprofile is not None:
+            self.cprofile.enable()
+        if self.memory and not self.tracemalloc.is_tracing():
+            self.tracemalloc.start()
+
+    def begin_iteration(self, label):
+        if not self.enabled:
+            return
+        self.label = label
+        self.stages = {}
+        self.iteration_calls = sum(self.calls.values())
+        self.iteration_start = time.perf_counter_ns()
+        if self.memory:
+            self.tracemalloc.reset_peak()
+
+    def end_iteration(self, verbose=True):
+        """Close the current iteration, store and print its summary"""
+        if not self.enabled or self.iteration_start is None:
+            return None
+        end = time.perf_counter_ns()
+        summary = {
+            "iteration": self.label,
+            "seconds": (end - self.iteration_start) / 1e9,
+            "stages": {
+                name: {"seconds": total / 1e9, "calls": count}
+                for name, (total, count) in self.stages.items()
+            },
+            "traci_calls": sum(self.calls.values()) - self.iteration_calls,
+        }
+        if self.memory:
+            summary["peak_memory_kb"] = self.tracemalloc.get_traced_memory()[1] // 1024
+        self.iterations.append(summary)
+        if self.trace and len(self.events) < self.max_events:
+            self.events.append((self.label, self.iteration_start, end, "iteration"))
+            self.counters.append((end, summary["traci_calls"]))
+        self.iteration_start = None
+
+        if verbose:
+            stages = " | ".join(
+                f"{name} {values['seconds']:.3f}s ({values['calls']})"
+                for name, values in sorted(summary["stages"].items(), key=lambda item: -item[1]["seconds"])
+            )
+            memory = f" | peak {summary['peak_memory_kb'] / 1024:.1f} MiB" if self.memory else ""
+            print(f"⏱️ {self.label}: {summary['seconds']:.2f}s | {stages} | "
+                  f"{summary['traci_calls']} TraCI calls{memory}")
+        return summary
+
+    def stop(self, cprofile_file=None, top=15):
+        """Stop cProfile/tracemalloc capture and print their top entries"""
+        if self.cprofile is not None:
+            self.cprofile.disable()
+            if cprofile_file:
+                self.cprofile.dump_stats(cprofile_file)
+                print(f"✅ cProfile stats written to {cprofile_file}")
+            import pstats
+            out = io.StringIO()
+            pstats.Stats(self.cprofile, stream=out).sort_stats("cumulative").print_stats(top)
+            print(out.getvalue())
+        if self.memory and self.tracemalloc.is_tracing():
+            snapshot = self.tracemalloc.take_snapshot()
+            print("🧠 Top allocations:")
+            for stat in snapshot.statistics("lineno")[:top]:
+                print(f"   {stat}")
+            self.tracemalloc.stop()
+
+    def summary(self):
+        return {"iterations": self.iterations, "traci_calls": dict(self.calls.most_common())}
+
+    def export_chrome_trace(self, path):
+        """Write stage/iteration spans as Chrome trace JSON (chrome://tracing, Perfetto)"""
+        pid = os.getpid()
+        events = [
+            {"name": name, "cat": category, "ph": "X", "pid": pid, "tid": 0 if category == "iteration" else 1,
+             "ts": (start - self.origin) / 1000, "dur": (end - start) / 1000}
+            for name, start, end, category in self.events
+        ]
+        for end, calls in self.counters:
+            events.append({"name": "traci_calls", "ph": "C", "pid": pid, "ts": (end - self.origin) / 1000,
+                           "args": {"calls": calls}})
+        with open(path, 'w') as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms",
+                       "otherData": {"summary": self.summary()}}, f)
+        print(f"✅ Chrome trace written to {path} ({len(events)} events)")
@@ -0,0 +1,180 @@
+import concurrent.futures
+import os
+import xml.etree.ElementTree as ET
+from collections import deque
+import numpy as np
+from simulator_backend import add_sumo_tools_path
+
+def net_file_from_config(config_file):
+    """Path of the network named in a .sumocfg file"""
+    net = ET.parse(config_file).getroot().find("input/net-file")
+    if net is None:
+        raise ValueError(f"No net-file in {config_file}")
+    return os.path.join(os.path.dirname(os.path.abspath(config_file)), net.get("value"))
+
+def solve_region(task):
+    """Solve the green-time game for one region (pool worker)"""
+    game, waits, vehicles, current, method = task
+    return game.solve(waits, vehicles, current, method=method)
+
+class RegionPartition:
+    """Traffic lights grouped into regions of adjacent intersections
+
+    Two traffic lights are adjacent when an edge leads from one to the
+    other, possibly through unsignalised junctions (up to max_hops edges).
+    Regions are grown breadth-first from the lowest unassigned TLS id up to
+    max_size members, so each one is a compact, connected patch. Links
+    between regions are the boundaries: (upstream TLS, downstream TLS,
+    edge entering the downstream junction).
+    """
+
+    def __init__(self, net_file, tls_ids=None, max_size=8, max_hops=3):
+        if not add_sumo_tools_path():
+            raise RuntimeError("Please set SUMO_HOME environment variable")
+        import sumolib
+
+        self.net = sumolib.net.readNet(net_file)
+        self.max_size = max_size
+        self.max_hops = max_hops
+        self.tls_nodes = {}
+        for tls in self.net.getTrafficLights():
+            if tls_ids is None or tls.getID() in tls_ids:
+                self.tls_nodes[tls.getID()] = {edge.getToNode().getID() for edge in tls.getEdges()}
+        self.links = self.find_links()
+        self.regions = self.partition()
+        self.region_of = {tls_id: r for r, members in enumerate(self.regions) for tls_id in members}
+        self.boundaries = [
+            (up, down, edge) for up, down, edge in self.links
+            if self.region_of[up] != self.region_of[down]
+        ]
+
+    def find_links(self):
+        """Directed (upstream, downstream, entering edge) links between traffic lights"""
+        node_owner = {node: tls_id for tls_id, nodes in self.tls_nodes.items() for node in nodes}
+        links = set()
+        for tls_id, nodes in self.tls_nodes.items():
+            queue = deque((edge, 1) for node in nodes for edge in self.net.getNode(node).getOutgoing())
+            seen = set()
+            while queue:
+                edge, hops = queue.popleft()
+                if edge.getID() in seen:
+                    continue
+                seen.add(edge.getID())
+                target = node_owner.get(edge.getToNode().getID())
+                if target == tls_id:
+                    continue
+                if target is not None:
+                    links.add((tls_id, target, edge.getID()))
+                elif hops < self.max_hops:
+                    queue.extend((out, hops + 1) for out in edge.getToNode().getOutgoing())
+        return sorted(links)
+
+    def partition(self):
+        neighbours = {tls_id: set() for tls_id in self.tls_nodes}
+        for up, down, _ in self.links:
+            neighbours[up].add(down)
+            neighbours[down].add(up)
+
+        regions = []
+        assigned = set()
+        for seed in sorted(self.tls_nodes):
+            if seed in assigned:
+                continue
+            region = []
+            queue = deque([seed])
+            while queue and len(region) < self.max_size:
+                tls_id = queue.popleft()
+                if tls_id in assigned:
+                    continue
+                assigned.add(tls_id)
+                region.append(tls_id)
+                queue.extend(sorted(neighbours[tls_id] - assigned))
+            regions.append(region)
+
+        # Fold fragments left between grown regions into their smallest neighbour
+        min_size = self.max_size // 3
+        region_of = {tls_id: r for r, members in enumerate(regions) for tls_id in members}
+        for r, members in enumerate(regions):
+            if not members or len(members) >= min_size:
+                continue
+            adjacent = {region_of[n] for tls_id in members for n in neighbours[tls_id]} - {r}
+            adjacent = [a for a in adjacent if regions[a]]
+            if not adjacent:
+                continue
+            target = min(adjacent, key=lambda a: len(regions[a]))
+            regions[target].extend(members)
+            for tls_id in members:
+                region_of[tls_id] = target
+            regions[r] = []
+        return [region for region in regions if region]
+
+class RegionalCoordinator:
+    """Solve the green-time game per region and couple regions through boundary flows
+
+    Every region is an independent game over its own intersections, so a
+    decision costs O(regions) small solves rather than one game over the
+    whole network; regions are solved in parallel when workers > 1. The
+    only information passed between regions is the flow on boundary edges:
+    after each exchange round, the vehicles measured on a boundary edge
+    are rescaled by how much its upstream intersection's green time
+    changed, and the downstream region re-solves with that anticipated
+    arrival count.
+    """
+
+    def __init__(self, partition, game, api=None, workers=None, exchange_rounds=2):
+        self.partition = partition
+        self.game = game
+        self.api = api
+        self.exchange_rounds = exchange_rounds
+        self.workers = workers or 1
+        self.pool = None
+        if self.workers > 1 and len(partition.regions) > 1:
+            self.pool = concurrent.futures.ProcessPoolExecutor(max_workers=self.workers)
+
+    def boundary_flows(self):
+        """Vehicles currently on each boundary edge"""
+        if self.api is None:
+            return {edge: 0 for _, _, edge in self.partition.boundaries}
+        return {
+            edge: self.api.edge.getLastStepVehicleNumber(edge)
+            for edge in {edge for _, _, edge in self.partition.boundaries}
+        }
+
+    def solve_regions(self, averages, current, adjustment, method):
+        tasks = []
+        for region in self.partition.regions:
+            tasks.append((
+                self.game,
+                [averages[tls_id]["wait"] for tls_id in region],
+                [max(0.0, averages[tls_id]["vehicles"] + adjustment.get(tls_id, 0.0)) for tls_id in region],
+                [current[tls_id] for tls_id in region],
+                method,
+            ))
+        if self.pool is not None:
+            results = self.pool.map(solve_region, tasks, chunksize=-(-len(tasks) // self.workers))
+        else:
+            results = map(solve_region, tasks)
+
+        plan = {}
+        for region, green in zip(self.partition.regions, results):
+            plan.update(zip(region, np.asarray(green).tolist()))
+        return plan
+
+    def solve(self, averages, current, method="best_response"):
+        """New green times for every intersection after exchange_rounds of boundary exchange"""
+        flows = self.boundary_flows()
+        adjustment = {}
+        plan = self.solve_regions(averages, current, adjustment, method)
+        for _ in range(self.exchange_rounds - 1):
+            adjustment = {}
+            for up, down, edge in self.partition.boundaries:
+                # Arrivals from upstream scale with the upstream green time
+                ratio = plan[up] / current[up] if current[up] else 1.0
+                adjustment[down] = adjustment.get(down, 0.0) + flows[edge] * (ratio - 1)
+            plan = self.solve_regions(averages, current, adjustment, method)
+        return plan
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
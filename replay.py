@@ -0,0 +1,152 @@
+import argparse
+import csv
+import itertools
+import time
+import numpy as np
+from metrics_sink import load_metrics
+from payoff import PayoffEngine
+
+PARAMETERS = ("wait_weight", "vehicle_weight", "demand_scale", "base_green", "min_green", "max_green", "smoothing")
+
+def parse_range(text):
+    """'name=start:stop:count' (inclusive linspace) or 'name=v1,v2,...'"""
+    name, values = text.split("=")
+    if name not in PARAMETERS:
+        raise ValueError(f"Unknown parameter '{name}', expected one of {PARAMETERS}")
+    if ":" in values:
+        start, stop, count = values.split(":")
+        return name, np.linspace(float(start), float(stop), int(count))
+    return name, np.array([float(v) for v in values.split(",")])
+
+def parameter_grid(ranges):
+    """{parameter: (P,) array} for the cartesian product of the given ranges"""
+    names = [name for name, _ in ranges]
+    rows = list(itertools.product(*(values for _, values in ranges)))
+    columns = np.array(rows, dtype=float).reshape(len(rows), len(names))
+    return {name: columns[:, i] for i, name in enumerate(names)}
+
+def parameter_samples(ranges, samples, seed=None):
+    """{parameter: (samples,) array} drawn uniformly between each range's min and max"""
+    rng = np.random.default_rng(seed)
+    return {name: rng.uniform(values.min(), values.max(), samples) for name, values in ranges}
+
+class ReplayEngine:
+    """Re-run the cooperative decision rule on recorded observations, without SUMO
+
+    The log is a MetricsSink directory (cooperative_control.py
+    --metrics-dir). It is cut into decision windows the way the live loop
+    evaluates a plan: window_seconds long, sampled every sample_interval
+    seconds, averaged per TLS. Every parameter setting then runs the same
+    PayoffEngine.allocate update as cooperative_decision, window by window,
+    with all settings broadcast together as one (P, 1, N) array.
+
+    Replay is open-loop: the recorded traffic does not react to the
+    replayed plans. Each plan is scored against the demand that the next
+    recorded window brought, with a fixed reference PayoffEngine:
+    welfare is its mean payoff sum, mismatch the mean total-variation
+    distance between green shares and demand shares, and change the mean
+    absolute green-time adjustment per decision.
+    """
+
+    def __init__(self, directory, window_seconds=300, sample_interval=10, reference=None):
+        data = load_metrics(directory, columns=["wait", "vehicles"], mmap=False)
+        self.tls_ids = data["tls_ids"]
+        self.reference = reference or PayoffEngine()
+        self.waits, self.vehicles = self.windows(
+            data["time"], data["wait"], data["vehicles"], window_seconds, sample_interval)
+
+    @staticmethod
+    def windows(times, waits, vehicles, window_seconds, sample_interval):
+        """(W, N) window averages of the rows sampled every sample_interval seconds"""
+        if len(times) == 0:
+            raise ValueError("No samples recorded")
+        keep = np.rint(times - times[0]) % sample_interval == 0
+        times, waits, vehicles = times[keep], waits[keep].astype(float), vehicles[keep].astype(float)
+        window = ((times - times[0]) // window_seconds).astype(np.intp)
+        starts = np.flatnonzero(np.r_[True, np.diff(window) != 0])
+        counts = np.diff(np.r_[starts, len(times)])[:, None]
+        return np.add.reduceat(waits, starts) / counts, np.add.reduceat(vehicles, starts) / counts
+
+    def run(self, parameters, initial=None):
+        """Replay every setting; returns {"green": (P, W, N) plans, "welfare", "mismatch", "change": (P,)}"""
+        size = len(next(iter(parameters.values()))) if parameters else 1
+        engine = PayoffEngine(**{name: np.asarray(values, dtype=float)[:, None, None]
+                                 for name, values in parameters.items()})
+        n_windows, n = self.waits.shape
+        if initial is None:
+            initial = np.broadcast_to(np.asarray(engine.base_green, dtype=float), (size, 1, 1))
+        green = start = np.broadcast_to(np.asarray(initial, dtype=float), (size, 1, n)).copy()
+
+        plans = np.empty((size, n_windows, n))
+        for w in range(n_windows):
+            green = engine.allocate(self.waits[w], self.vehicles[w], green)
+            plans[:, w] = green[:, 0]
+
+        # Plan decided after window w serves window w + 1
+        served = plans[:, :-1]
+        demand = self.reference.demand(self.waits[1:], self.vehicles[1:])
+        if len(demand):
+            welfare = self.reference.welfare(demand, served).mean(axis=1)
+            share = served / served.sum(axis=-1, keepdims=True)
+            total = demand.sum(axis=-1, keepdims=True)
+            need = np.divide(demand, total, out=np.full_like(demand, 1.0 / n), where=total > 0)
+            mismatch = 0.5 * np.abs(share - need).sum(axis=-1).mean(axis=1)
+        else:
+            welfare = mismatch = np.zeros(size)
+        previous = np.concatenate([start, plans[:, :-1]], axis=1)
+        change = np.abs(plans - previous).mean(axis=(1, 2))
+        return {"green": plans, "welfare": welfare, "mismatch": mismatch, "change": change}
+
+def write_results(path, parameters, results, order):
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(list(parameters) + ["welfare", "mismatch", "change"])
+        for i in order:
+            writer.writerow([f"{values[i]:g}" for values in parameters.values()]
+                            + [f"{results[name][i]:.6g}" for name in ("welfare", "mismatch", "change")])
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Score controller parameters on recorded traffic without SUMO")
+    parser.add_argument("metrics_dir", help="directory written by cooperative_control.py --metrics-dir")
+    parser.add_argument("--param", type=parse_range, action="append", default=[],
+                        help="parameter range as name=start:stop:count or name=v1,v2,..., repeatable "
+                             f"({', '.join(PARAMETERS)})")
+    parser.add_argument("--random", type=int,
+                        help="draw this many random settings within the ranges instead of the full grid")
+    parser.add_argument("--seed", type=int, default=42, help="random seed for --random")
+    parser.add_argument("--window", type=float, default=300, help="decision window (simulated seconds)")
+    parser.add_argument("--sample-interval", type=float, default=10, help="sampling interval within a window")
+    parser.add_argument("--top", type=int, default=10, help="settings to print")
+    parser.add_argument("--output", help="write all settings and scores to this CSV file")
+    args = parser.parse_args(argv)
+    if args.random is not None and not args.param:
+        parser.error("--random needs at least one --param range to sample from")
+    return args
+
+def main(argv=None):
+    args = parse_args(argv)
+    engine = ReplayEngine(args.metrics_dir, args.window, args.sample_interval)
+    if args.random:
+        parameters = parameter_samples(args.param, args.random, args.seed)
+    else:
+        parameters = parameter_grid(args.param)
+    size = len(next(iter(parameters.values()))) if parameters else 1
+    print(f"✅ Replaying {engine.waits.shape[0]} windows of {len(engine.tls_ids)} intersections "
+          f"for {size} settings")
+
+    started = time.perf_counter()
+    results = engine.run(parameters)
+    seconds = time.perf_counter() - started
+    print(f"✅ Scored {size} settings in {seconds:.3f}s")
+
+    order = np.argsort(-results["welfare"], kind="stable")
+    for rank, i in enumerate(order[:args.top], 1):
+        setting = ", ".join(f"{name}={values[i]:g}" for name, values in parameters.items()) or "defaults"
+        print(f"🏆 {rank}. {setting} | welfare {results['welfare'][i]:.2f}, "
+              f"mismatch {results['mismatch'][i]:.3f}, change {results['change'][i]:.2f}s")
+    if args.output:
+        write_results(args.output, parameters, results, order)
+        print(f"✅ Results written to {args.output}")
+
+if __name__ == "__main__":
+    main()
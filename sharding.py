@@ -0,0 +1,415 @@
+import argparse
+import json
+import math
+import multiprocessing
+import os
+import subprocess
+import time
+import xml.etree.ElementTree as ET
+from collections import deque
+from create_network import sumo_binary
+from game_solver import SOLVER_METHODS, GreenTimeGame, decide_green_times
+from network_index import NetworkIndex
+from payoff import PayoffEngine
+from regions import RegionPartition
+from simulator_backend import BACKENDS, add_sumo_tools_path, get_backend
+from utils import file_hash
+
+def config_inputs(config_file):
+    """Network, route files, begin, end and step length named in a .sumocfg file"""
+    root = ET.parse(config_file).getroot()
+    base = os.path.dirname(os.path.abspath(config_file))
+
+    def value(path, default=None):
+        element = root.find(path)
+        return element.get("value") if element is not None else default
+
+    routes = value("input/route-files", "")
+    return {
+        "net": os.path.join(base, value("input/net-file")),
+        "routes": [os.path.join(base, route) for route in routes.split(",") if route],
+        "begin": float(value("time/begin", 0)),
+        "end": float(value("time/end", -1)),
+        "step_length": float(value("time/step-length", 1)),
+    }
+
+def run_tool(cmd, what):
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"{what} failed: {result.stderr.strip()}")
+
+class ShardPlan:
+    """A network split into sub-networks of adjacent traffic lights, one per shard
+
+    Traffic lights are grouped with RegionPartition into at most about
+    `shards` compact regions; every other junction joins the region of the
+    nearest traffic light (breadth-first over the road graph). An edge
+    belongs to the shard of the junction it leads into, so each TLS keeps
+    all of its approaches. Edges leaving a shard are also copied into it
+    as exits: a vehicle arrives there as soon as it enters the exit edge
+    and is inserted at the start of the same edge in the next shard.
+    Sub-networks are cut with netconvert and cached per network hash.
+    """
+
+    def __init__(self, net_file, shards=2, directory=".shards"):
+        if not add_sumo_tools_path():
+            raise RuntimeError("Please set SUMO_HOME environment variable")
+        tls_count = len(NetworkIndex.load(net_file).tls)
+        partition = RegionPartition(net_file, max_size=max(1, math.ceil(tls_count / shards)))
+        self.net_file = net_file
+        self.tls_ids = [list(region) for region in partition.regions]
+        self.directory = os.path.join(directory, f"{file_hash(net_file)}_{len(self.tls_ids)}")
+
+        node_shard = self.assign_nodes(partition)
+        self.edge_owner = {}
+        edges = [set() for _ in self.tls_ids]
+        for edge in partition.net.getEdges():
+            if edge.getFunction() == "internal":
+                continue
+            owner = node_shard[edge.getToNode().getID()]
+            self.edge_owner[edge.getID()] = owner
+            edges[owner].add(edge.getID())
+            edges[node_shard[edge.getFromNode().getID()]].add(edge.getID())
+        self.net_files = [self.cut(shard, sorted(shard_edges)) for shard, shard_edges in enumerate(edges)]
+
+    def assign_nodes(self, partition):
+        """{junction: shard} by multi-source breadth-first search from the TLS junctions"""
+        node_shard = {}
+        queue = deque()
+        for shard, members in enumerate(self.tls_ids):
+            for tls_id in members:
+                for node in sorted(partition.tls_nodes[tls_id]):
+                    if node not in node_shard:
+                        node_shard[node] = shard
+                        queue.append(node)
+        while queue:
+            node = partition.net.getNode(queue.popleft())
+            for edge in node.getOutgoing() + node.getIncoming():
+                for neighbour in (edge.getFromNode().getID(), edge.getToNode().getID()):
+                    if neighbour not in node_shard:
+                        node_shard[neighbour] = node_shard[node.getID()]
+                        queue.append(neighbour)
+        for node in partition.net.getNodes():
+            node_shard.setdefault(node.getID(), 0)  # Unconnected to any TLS
+        return node_shard
+
+    def cut(self, shard, edges):
+        path = os.path.join(self.directory, f"shard_{shard}.net.xml")
+        if os.path.exists(path):
+            return path
+        os.makedirs(self.directory, exist_ok=True)
+        edge_file = os.path.join(self.directory, f"shard_{shard}.edges.txt")
+        with open(edge_file, 'w') as f:
+            f.write("\n".join(edges) + "\n")
+        tmp_path = path + f".{os.getpid()}.tmp.net.xml"
+        run_tool([sumo_binary("netconvert"), "-s", self.net_file, "--keep-edges.input-file", edge_file,
+                  "-o", tmp_path, "--no-warnings"], f"netconvert for shard {shard}")
+        os.replace(tmp_path, path)
+        return path
+
+    def split_route(self, edges):
+        """[(shard, edges)] segments; every segment but the last ends on its exit edge"""
+        segments = []
+        for edge in edges:
+            shard = self.edge_owner[edge]
+            if segments and segments[-1][0] == shard:
+                segments[-1][1].append(edge)
+                continue
+            if segments:
+                segments[-1][1].append(edge)
+            segments.append((shard, [edge]))
+        return segments
+
+def expand_demand(config, directory):
+    """Expand the scenario's routes/flows into individual vehicles with duarouter
+
+    Returns (vehicle file, vType file), both cached by input hash.
+    """
+    digest = file_hash(config["net"])[:8] + "".join(file_hash(route)[:8] for route in config["routes"])
+    vehicles = os.path.join(directory, f"demand_{digest}.rou.xml")
+    types = os.path.join(directory, f"demand_{digest}.types.xml")
+    if not (os.path.exists(vehicles) and os.path.exists(types)):
+        os.makedirs(directory, exist_ok=True)
+        cmd = [sumo_binary("duarouter"), "-n", config["net"], "-r", ",".join(config["routes"]),
+               "-o", vehicles, "--vtype-output", types, "--begin", str(config["begin"]),
+               "--no-step-log", "--no-warnings"]
+        if config["end"] >= 0:
+            cmd += ["--end", str(config["end"])]
+        run_tool(cmd, "duarouter")
+    return vehicles, types
+
+def departures(route_file):
+    """Yield (depart, vehicle, type, edges) from an expanded route file, in file order"""
+    for _, element in ET.iterparse(route_file):
+        if element.tag == "vehicle":
+            route = element.find("route")
+            yield (float(element.get("depart")), element.get("id"), element.get("type", "DEFAULT_VEHTYPE"),
+                   route.get("edges").split())
+            element.clear()
+
+def shard_worker(connection, spec):
+    """Run one shard's SUMO and answer the coordinator's commands (worker process)
+
+    Commands are (name, payload) tuples; replies are ("ok", result) or
+    ("error", message).
+      step:    payload (inserts, sample); insert vehicles, step once, reply
+               (arrived vehicle ids, per-TLS metrics if sample else None)
+      program: payload {tls: green}; reprogram those signals
+      close:   stop SUMO and exit
+    """
+    # Imported here so worker processes do not import the controller at fork time
+    from cooperative_control import CooperativeTrafficControl
+    import traci.constants as tc
+
+    backend = get_backend(spec["backend"], label=f"shard_{spec['shard']}")
+    controller = CooperativeTrafficControl(backend)
+    controller.verbose = False
+    controller.green_times = {tls_id: spec["base_green"] for tls_id in spec["tls_ids"]}
+    try:
+        sim = backend.start([
+            "-n", spec["net"], "--additional-files", spec["types"],
+            "--begin", str(spec["begin"]), "--step-length", str(spec["step_length"]),
+            "--seed", str(spec["seed"]), "--no-step-log", "--no-warnings",
+        ])
+        sim.simulation.subscribe([tc.VAR_ARRIVED_VEHICLES_IDS])
+        controller.ensure_collector()
+        routes = 0
+        while True:
+            command, payload = connection.recv()
+            if command == "step":
+                inserts, sample = payload
+                for vehicle, type_id, edges, exit_edge in inserts:
+                    route_id = f"shard_route_{routes}"
+                    routes += 1
+                    sim.route.add(route_id, edges)
+                    sim.vehicle.add(vehicle, route_id, type_id, depart="now", departLane="best",
+                                    departSpeed="max", arrivalPos="0" if exit_edge else "max")
+                sim.simulationStep()
+                arrived = sim.simulation.getSubscriptionResults()[tc.VAR_ARRIVED_VEHICLES_IDS]
+                connection.send(("ok", (arrived, controller.collector.collect() if sample else None)))
+            elif command == "program":
+                controller.green_times.update(payload)
+                for tls_id, green_time in payload.items():
+                    controller.set_traffic_light_phases(tls_id, green_time)
+                connection.send(("ok", None))
+            elif command == "close":
+                break
+    except Exception as e:
+        connection.send(("error", f"shard {spec['shard']}: {e}"))
+    finally:
+        backend.close()
+        connection.close()
+
+class ShardedSimulation:
+    """One scenario run as lock-stepped SUMO shards, with signal decisions made centrally
+
+    Each shard is a worker process with its own SUMO (ShardPlan sub-network)
+    connected by a pipe. Every step the coordinator sends each shard its
+    insertions (new departures and vehicles handed over at boundaries),
+    lets all shards step in parallel and collects which vehicles arrived.
+    A vehicle arriving at a shard exit is inserted into the next shard on
+    the following step. Every evaluation_steps the per-TLS averages from all
+    shards go through the same decision as CooperativeTrafficControl (the
+    game solver when given, else the proportional rule of
+    cooperative_decision) and the new green times are sent to their shards.
+    """
+
+    def __init__(self, config_file, shards=2, backend="libsumo", solver=None, method="best_response",
+                 sample_interval=10, directory=".shards", seed=42):
+        if backend == "sumo-gui":
+            backend = "sumo"  # Shards always run headless
+        self.config = config_inputs(config_file)
+        self.plan = ShardPlan(self.config["net"], shards, directory)
+        self.backend = backend
+        self.solver = solver
+        self.method = method
+        self.payoff = solver.payoff if solver is not None else PayoffEngine()
+        self.sample_interval = sample_interval
+        self.directory = directory
+        self.seed = seed
+        self.time = self.config["begin"]
+        self.green_times = {tls_id: self.payoff.base_green for members in self.plan.tls_ids for tls_id in members}
+        self.connections = []
+        self.processes = []
+        self.inserts = [[] for _ in self.plan.tls_ids]
+        self.in_flight = {}  # vehicle -> (type, segments, current segment)
+        self.released = self.arrived = self.transfers = self.steps = 0
+
+    def start(self):
+        vehicles, types = expand_demand(self.config, self.directory)
+        self.demand = departures(vehicles)
+        self.next_departure = next(self.demand, None)
+        for shard, (net, tls_ids) in enumerate(zip(self.plan.net_files, self.plan.tls_ids)):
+            parent, child = multiprocessing.Pipe()
+            spec = {
+                "shard": shard, "net": net, "types": types, "tls_ids": tls_ids, "backend": self.backend,
+                "begin": self.config["begin"], "step_length": self.config["step_length"],
+                "seed": self.seed + shard, "base_green": self.payoff.base_green,
+            }
+            process = multiprocessing.Process(target=shard_worker, args=(child, spec), daemon=True)
+            process.start()
+            child.close()
+            self.connections.append(parent)
+            self.processes.append(process)
+        self.program(self.green_times)
+
+    def request(self, messages):
+        """Send one command per shard, then gather all replies (shards work in parallel)"""
+        for connection, message in zip(self.connections, messages):
+            connection.send(message)
+        replies = []
+        for connection in self.connections:
+            status, payload = connection.recv()
+            if status != "ok":
+                raise RuntimeError(payload)
+            replies.append(payload)
+        return replies
+
+    def program(self, green_times):
+        self.request([
+            ("program", {tls_id: green_times[tls_id] for tls_id in members}) for members in self.plan.tls_ids
+        ])
+
+    def queue(self, vehicle, type_id, segments, index):
+        shard, edges = segments[index]
+        self.inserts[shard].append((vehicle, type_id, edges, index < len(segments) - 1))
+        self.in_flight[vehicle] = (type_id, segments, index)
+
+    def step(self, sample=False):
+        """Advance every shard by one step; returns merged per-TLS metrics when sampling"""
+        horizon = self.time + self.config["step_length"]
+        while self.next_departure is not None and self.next_departure[0] < horizon:
+            _, vehicle, type_id, edges = self.next_departure
+            self.queue(vehicle, type_id, self.plan.split_route(edges), 0)
+            self.released += 1
+            self.next_departure = next(self.demand, None)
+
+        inserts, self.inserts = self.inserts, [[] for _ in self.plan.tls_ids]
+        replies = self.request([("step", (shard_inserts, sample)) for shard_inserts in inserts])
+        self.time = horizon
+        self.steps += 1
+
+        metrics = {}
+        for arrived, shard_metrics in replies:
+            for vehicle in arrived:
+                type_id, segments, index = self.in_flight.pop(vehicle)
+                if index + 1 < len(segments):
+                    self.queue(vehicle, type_id, segments, index + 1)
+                    self.transfers += 1
+                else:
+                    self.arrived += 1
+            if shard_metrics:
+                metrics.update(shard_metrics)
+        return metrics
+
+    def decide(self, averages):
+        """New green times for every TLS from the window averages"""
+        tls_ids = list(self.green_times)
+        waits = [averages[tls_id]["wait"] for tls_id in tls_ids]
+        vehicles = [averages[tls_id]["vehicles"] for tls_id in tls_ids]
+        current = [self.green_times[tls_id] for tls_id in tls_ids]
+        green = decide_green_times(waits, vehicles, current, self.solver, self.method, self.payoff)
+        return dict(zip(tls_ids, green.tolist()))
+
+    def finished(self):
+        end = self.config["end"]
+        return (0 <= end <= self.time) or (self.next_departure is None and not self.in_flight)
+
+    def run(self, steps=None, evaluation_steps=300):
+        """Step until the scenario ends (or for steps), re-deciding every evaluation_steps"""
+        started = time.perf_counter()
+        wait_sum = {tls_id: 0.0 for tls_id in self.green_times}
+        vehicle_sum = {tls_id: 0.0 for tls_id in self.green_times}
+        samples = window_step = decisions = 0
+        waits = []
+        while (steps is None or self.steps < steps) and not self.finished():
+            sample = window_step % self.sample_interval == 0
+            metrics = self.step(sample)
+            if sample:
+                for tls_id, values in metrics.items():
+                    wait_sum[tls_id] += values["wait"]
+                    vehicle_sum[tls_id] += values["vehicles"]
+                samples += 1
+            window_step += 1
+            if window_step == evaluation_steps:
+                averages = {
+                    tls_id: {"wait": wait_sum[tls_id] / samples, "vehicles": vehicle_sum[tls_id] / samples}
+                    for tls_id in self.green_times
+                }
+                total_wait = sum(values["wait"] for values in averages.values())
+                waits.append(total_wait)
+                self.green_times = self.decide(averages)
+                self.program(self.green_times)
+                decisions += 1
+                print(f"🔄 t={self.time:.0f}s: total wait {total_wait:.1f}s, {len(self.in_flight)} vehicles "
+                      f"in flight, {self.transfers} transfers | " + " | ".join(
+                          f"{tls_id} {green:.1f}s" for tls_id, green in list(self.green_times.items())[:10]))
+                wait_sum = dict.fromkeys(wait_sum, 0.0)
+                vehicle_sum = dict.fromkeys(vehicle_sum, 0.0)
+                samples = window_step = 0
+
+        seconds = time.perf_counter() - started
+        return {
+            "shards": len(self.plan.tls_ids),
+            "steps": self.steps,
+            "sim_time": self.time,
+            "released": self.released,
+            "arrived": self.arrived,
+            "in_flight": len(self.in_flight),
+            "transfers": self.transfers,
+            "decisions": decisions,
+            "waits": waits,
+            "green_times": dict(self.green_times),
+            "wall_seconds": seconds,
+            "steps_per_second": self.steps / seconds if seconds > 0 else 0,
+        }
+
+    def close(self):
+        for connection in self.connections:
+            try:
+                connection.send(("close", None))
+            except (BrokenPipeError, OSError):
+                pass
+        for process in self.processes:
+            process.join(timeout=10)
+            if process.is_alive():
+                process.kill()
+        self.connections = []
+        self.processes = []
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run one scenario as lock-stepped SUMO shards")
+    parser.add_argument("-c", "--config", default="generated_config.sumocfg", help="SUMO configuration file")
+    parser.add_argument("--shards", type=int, default=2, help="number of SUMO worker processes")
+    parser.add_argument("--backend", choices=[b for b in BACKENDS if b != "sumo-gui"], default="libsumo",
+                        help="headless simulator backend for the shards")
+    parser.add_argument("--solver", choices=SOLVER_METHODS,
+                        help="solve the N-intersection game with this method instead of the proportional rule")
+    parser.add_argument("--steps", type=int, help="stop after this many steps (default: scenario end)")
+    parser.add_argument("--window", type=int, default=300, help="steps between decisions")
+    parser.add_argument("--sample-interval", type=int, default=10, help="steps between metric samples")
+    parser.add_argument("--seed", type=int, default=42, help="SUMO random seed of the first shard")
+    parser.add_argument("--results", help="write a JSON run summary to this file")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    solver = GreenTimeGame() if args.solver else None
+    simulation = ShardedSimulation(args.config, args.shards, backend=args.backend, solver=solver,
+                                   method=args.solver, sample_interval=args.sample_interval, seed=args.seed)
+    print(f"✅ {len(simulation.plan.tls_ids)} shards: " + " | ".join(
+        f"{len(members)} TLS" for members in simulation.plan.tls_ids))
+    try:
+        simulation.start()
+        summary = simulation.run(args.steps, evaluation_steps=args.window)
+        print(f"📊 {summary['steps']} steps on {summary['shards']} shards: {summary['released']} released, "
+              f"{summary['arrived']} arrived, {summary['transfers']} boundary transfers, "
+              f"{summary['steps_per_second']:.0f} steps/s")
+        if args.results:
+            with open(args.results, 'w') as f:
+                json.dump(summary, f, indent=2)
+    finally:
+        simulation.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+import sys
+import time
+from multiprocessing import shared_memory
+import numpy as np
+from game_solver import decide_green_times
+from metrics_sink import COLUMNS
+from payoff import PayoffEngine
+
+def attach_shared_memory(name):
+    """Open an existing block; only its creator unlinks it"""
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    # Child processes share the creator's resource tracker, where the name is
+    # already registered, so attaching adds nothing for it to clean up
+    return shared_memory.SharedMemory(name=name)
+
+def layout(fields):
+    """Byte offsets of (name, dtype, shape) fields packed into one block, 8-byte aligned"""
+    offsets, position = {}, 0
+    for name, dtype, shape in fields:
+        offsets[name] = position
+        position += -(-np.dtype(dtype).itemsize * int(np.prod(shape)) // 8) * 8
+    return offsets, position
+
+class ObservationRing:
+    """Fixed-size ring of per-TLS observations in shared memory, one writer, any readers
+
+    Rows hold the MetricsSink columns (wait, queue, vehicles, phase as
+    (capacity, n_tls) arrays) plus the simulation time. Readers map the
+    same block and copy rows straight out of it, so observations cross
+    the process boundary without pickling. The writer fills a row, then
+    bumps the shared row counter; a reader copies the rows between its
+    cursor and the counter and re-checks the counter afterwards to drop
+    any row the writer lapped while it was copying.
+    """
+
+    def __init__(self, n_tls, capacity=4096, name=None, create=True):
+        self.n_tls = n_tls
+        self.capacity = capacity
+        fields = [("count", np.int64, (1,)), ("time", np.float64, (capacity,))]
+        fields += [(column, dtype, (capacity, n_tls)) for column, dtype in COLUMNS.items()]
+        offsets, size = layout(fields)
+        if create:
+            self.block = shared_memory.SharedMemory(create=True, size=size, name=name)
+        else:
+            self.block = attach_shared_memory(name)
+        self.owner = create
+        self.name = self.block.name
+        arrays = {
+            field: np.ndarray(shape, dtype=dtype, buffer=self.block.buf, offset=offsets[field])
+            for field, dtype, shape in fields
+        }
+        self.count = arrays.pop("count")
+        self.time = arrays.pop("time")
+        self.columns = arrays
+        if create:
+            self.count[0] = 0
+
+    @classmethod
+    def attach(cls, name, n_tls, capacity=4096):
+        return cls(n_tls, capacity, name=name, create=False)
+
+    def write(self, time, wait, queue, vehicles, phase):
+        """Append one row given as arrays ordered like the TLS list"""
+        count = int(self.count[0])
+        row = count % self.capacity
+        self.time[row] = time
+        self.columns["wait"][row] = wait
+        self.columns["queue"][row] = queue
+        self.columns["vehicles"][row] = vehicles
+        self.columns["phase"][row] = phase
+        self.count[0] = count + 1
+
+    def write_metrics(self, time, metrics, tls_ids):
+        """Append one row from MetricsCollector.collect()"""
+        self.write(
+            time,
+            [metrics[tls_id]["wait"] for tls_id in tls_ids],
+            [metrics[tls_id]["queue"] for tls_id in tls_ids],
+            [metrics[tls_id]["vehicles"] for tls_id in tls_ids],
+            [metrics[tls_id]["phase"] for tls_id in tls_ids],
+        )
+
+    def read_since(self, cursor):
+        """(new cursor, {"time", <column>: arrays of the rows since cursor}, rows lost to lapping)"""
+        end = int(self.count[0])
+        start = max(cursor, end - self.capacity)
+        rows = np.arange(start, end) % self.capacity
+        data = {"time": self.time[rows]}
+        for column, values in self.columns.items():
+            data[column] = values[rows]
+        # Rows the writer reached again while we copied are no longer the ones we wanted
+        valid_from = int(self.count[0]) - self.capacity
+        if valid_from > start:
+            skip = min(valid_from - start, len(rows))
+            data = {name: values[skip:] for name, values in data.items()}
+            start += skip
+        return end, data, start - cursor
+
+    def close(self):
+        self.count = self.time = self.columns = None
+        self.block.close()
+        if self.owner:
+            self.block.unlink()
+
+class PlanBoard:
+    """Latest green-time plan in shared memory, published by one process and polled by another
+
+    A sequence lock guards the values: the version is odd while a plan is
+    being written, so a reader retries until it sees the same even
+    version before and after copying.
+    """
+
+    def __init__(self, n_tls, name=None, create=True):
+        offsets, size = layout([("version", np.int64, (1,)), ("green", np.float64, (n_tls,))])
+        if create:
+            self.block = shared_memory.SharedMemory(create=True, size=size, name=name)
+        else:
+            self.block = attach_shared_memory(name)
+        self.owner = create
+        self.name = self.block.name
+        self.version = np.ndarray((1,), dtype=np.int64, buffer=self.block.buf, offset=offsets["version"])
+        self.green = np.ndarray((n_tls,), dtype=np.float64, buffer=self.block.buf, offset=offsets["green"])
+        if create:
+            self.version[0] = 0
+
+    @classmethod
+    def attach(cls, name, n_tls):
+        return cls(n_tls, name=name, create=False)
+
+    def publish(self, green):
+        self.version[0] += 1
+        self.green[:] = green
+        self.version[0] += 1
+
+    def read(self):
+        """(version, copy of the plan); version 0 means nothing published yet"""
+        while True:
+            before = int(self.version[0])
+            if before % 2 == 0:
+                green = self.green.copy()
+                if int(self.version[0]) == before:
+                    return before, green
+
+    def close(self):
+        self.version = self.green = None
+        self.block.close()
+        if self.owner:
+            self.block.unlink()
+
+def decision_worker(ring_name, board_name, n_tls, capacity, initial, window, solver, method, stop, poll=0.001):
+    """Decide green times from windows of shared observations (decision process)
+
+    Rows are grouped into windows of `window` simulated seconds; when the
+    first row of the next window arrives, the finished window's averages go
+    through the game solver (or the proportional rule without one) and the
+    plan is published on the board.
+    """
+    ring = ObservationRing.attach(ring_name, n_tls, capacity)
+    board = PlanBoard.attach(board_name, n_tls)
+    payoff = solver.payoff if solver is not None else PayoffEngine()
+    current = np.asarray(initial, dtype=float)
+    cursor = 0
+    start = None
+    current_window = 0
+    wait_sum = np.zeros(n_tls)
+    vehicle_sum = np.zeros(n_tls)
+    samples = 0
+    try:
+        while not stop.is_set():
+            cursor, data, _ = ring.read_since(cursor)
+            if len(data["time"]) == 0:
+                time.sleep(poll)
+                continue
+            if start is None:
+                start = data["time"][0]
+            windows = ((data["time"] - start) // window).astype(np.intp)
+            for index in np.unique(windows):
+                if index > current_window:
+                    if samples:
+                        waits, vehicles = wait_sum / samples, vehicle_sum / samples
+                        current = decide_green_times(waits, vehicles, current, solver, method, payoff)
+                        board.publish(current)
+                    current_window = index
+                    wait_sum[:] = 0
+                    vehicle_sum[:] = 0
+                    samples = 0
+                rows = windows == index
+                wait_sum += data["wait"][rows].sum(axis=0)
+                vehicle_sum += data["vehicles"][rows].sum(axis=0)
+                samples += int(rows.sum())
+    finally:
+        ring.close()
+        board.close()
@@ -0,0 +1,104 @@
+import os
+import sys
+
+BACKENDS = ("libsumo", "sumo", "sumo-gui")
+DEFAULT_BACKEND = os.environ.get("SUMO_BACKEND", "sumo-gui")
+
+def add_sumo_tools_path():
+    """Make $SUMO_HOME/tools importable, return False if SUMO_HOME is unset"""
+    if 'SUMO_HOME' not in os.environ:
+        return False
+    tools = os.path.join(os.environ['SUMO_HOME'], 'tools')
+    if tools not in sys.path:
+        sys.path.append(tools)
+    return True
+
+class SimulatorBackend:
+    """Common interface for starting, stepping and closing a SUMO simulation"""
+    name = None
+    binary = "sumo"
+
+    def __init__(self, port=None, label="default", extra_args=None):
+        self.port = port
+        self.label = label
+        self.extra_args = list(extra_args or [])
+        self.args = []
+        self.running = False
+
+    @property
+    def api(self):
+        """Module exposing the TraCI domains (trafficlight, lane, vehicle, ...)"""
+        raise NotImplementedError
+
+    def command(self, sumo_args):
+        return [self.binary] + list(sumo_args) + self.extra_args
+
+    def start(self, sumo_args):
+        """Start SUMO with the given arguments (e.g. ["-c", "config.sumocfg"])"""
+        self.args = list(sumo_args)
+        self.api.start(self.command(self.args), port=self.port, label=self.label)
+        self.running = True
+        return self.api
+
+    def reload(self, sumo_args=None):
+        """Reset the running simulation from sumo_args (default: the last ones) in the same process"""
+        if sumo_args is not None:
+            self.args = list(sumo_args)
+        # load() takes everything but the binary
+        self.api.load(self.command(self.args)[1:])
+        return self.api
+
+    def step(self):
+        self.api.simulationStep()
+
+    def close(self):
+        if self.running:
+            self.api.close()
+            self.running = False
+
+class LibsumoBackend(SimulatorBackend):
+    """In-process SUMO through libsumo, no socket round trip per call"""
+    name = "libsumo"
+
+    @property
+    def api(self):
+        import libsumo
+        return libsumo
+
+class TraciBackend(SimulatorBackend):
+    """Headless SUMO process controlled over a TraCI socket"""
+    name = "sumo"
+
+    @property
+    def api(self):
+        import traci
+        return traci
+
+class GuiBackend(TraciBackend):
+    """sumo-gui controlled over a TraCI socket"""
+    name = "sumo-gui"
+    binary = "sumo-gui"
+
+    def command(self, sumo_args):
+        return super().command(sumo_args) + ["--start"]
+
+_BACKEND_CLASSES = {
+    "libsumo": LibsumoBackend,
+    "sumo": TraciBackend,
+    "sumo-gui": GuiBackend,
+}
+
+def get_backend(name=None, **kwargs):
+    """Create a backend by name, defaulting to $SUMO_BACKEND or sumo-gui"""
+    name = name or DEFAULT_BACKEND
+    if name not in _BACKEND_CLASSES:
+        raise ValueError(f"Unknown simulator backend '{name}', expected one of {BACKENDS}")
+    return _BACKEND_CLASSES[name](**kwargs)
+
+def add_backend_argument(parser):
+    """Add the --backend option to an argparse parser"""
+    parser.add_argument(
+        "--backend", choices=BACKENDS, default=DEFAULT_BACKEND,
+        help="simulator backend (default: $SUMO_BACKEND or sumo-gui)"
+    )
+    return parser
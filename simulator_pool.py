@@ -0,0 +1,196 @@
+import argparse
+import multiprocessing
+import os
+import time
+from multiprocessing.connection import Client, Listener, wait
+from simulator_backend import BACKENDS, get_backend
+
+AUTHKEY = b"cooperative-control-pool"
+
+def parse_address(text):
+    """'host:port' as a TCP address, anything else as a Unix socket path"""
+    host, _, port = text.rpartition(":")
+    if host and port.isdigit():
+        return host, int(port)
+    return text
+
+class WarmSimulator:
+    """One SUMO instance kept running between jobs and reset with load()
+
+    The first job starts SUMO; later ones call load() with the job's own
+    arguments, which resets the simulation in the running process (new
+    seed, state file, ...) without a new process, socket handshake or
+    connect retry. A job that fails drops the instance so the next one
+    starts fresh.
+    """
+
+    def __init__(self, backend="sumo", port=None, label="warm"):
+        self.backend = get_backend(backend, port=port, label=label)
+        self.cold_starts = 0
+        self.jobs = 0
+
+    def reset(self, sumo_args):
+        """Return the API with the simulation (re)loaded from sumo_args"""
+        if not self.backend.running:
+            self.cold_starts += 1
+            return self.backend.start(sumo_args)
+        return self.backend.reload(sumo_args)
+
+    def run(self, task):
+        """Evaluate one candidate task (see parallel_evaluation.evaluate_on)"""
+        from parallel_evaluation import evaluate_on
+
+        self.jobs += 1
+        result = evaluate_on(self.backend, task, self.reset)
+        if result["error"]:
+            self.close()
+        return result
+
+    def close(self):
+        try:
+            self.backend.close()
+        except Exception:
+            self.backend.running = False  # The process is gone already
+
+def pool_worker(connection, backend, port):
+    """Serve tasks from the pool on one warm simulator (worker process)"""
+    simulator = WarmSimulator(backend, port=port, label=f"warm_{os.getpid()}")
+    try:
+        while True:
+            task = connection.recv()
+            if task is None:
+                break
+            connection.send(simulator.run(task))
+    except (EOFError, KeyboardInterrupt):
+        pass
+    finally:
+        simulator.close()
+        connection.close()
+
+class SimulatorPool:
+    """Worker processes that each keep one warm simulator across batches
+
+    map() hands each idle worker the next task and collects results as
+    they finish, so a batch costs one SUMO start per worker for the
+    lifetime of the pool rather than one per task.
+    """
+
+    def __init__(self, workers=None, backend="sumo", base_port=None):
+        if backend == "sumo-gui":
+            backend = "sumo"  # Workers always run headless
+        self.workers = workers or os.cpu_count() or 1
+        self.backend = backend
+        self.base_port = base_port
+        self.connections = []
+        self.processes = []
+
+    def start(self):
+        for worker in range(self.workers):
+            parent, child = multiprocessing.Pipe()
+            port = self.base_port + worker if self.base_port else None
+            process = multiprocessing.Process(target=pool_worker, args=(child, self.backend, port), daemon=True)
+            process.start()
+            child.close()
+            self.connections.append(parent)
+            self.processes.append(process)
+
+    def map(self, tasks):
+        """Results for tasks, in task order"""
+        if not self.processes:
+            self.start()
+        pending = list(enumerate(tasks))[::-1]
+        results = [None] * len(tasks)
+        busy = {}
+        for connection in self.connections:
+            if not pending:
+                break
+            busy[connection] = pending.pop()
+            connection.send(busy[connection][1])
+        while busy:
+            for connection in wait(list(busy)):
+                position, task = busy.pop(connection)
+                try:
+                    results[position] = connection.recv()
+                except EOFError:
+                    raise RuntimeError(f"Simulator pool worker died on task {task.get('index', position)}")
+                if pending:
+                    busy[connection] = pending.pop()
+                    connection.send(busy[connection][1])
+        return results
+
+    def close(self):
+        for connection in self.connections:
+            try:
+                connection.send(None)
+            except (BrokenPipeError, OSError):
+                pass
+        for process in self.processes:
+            process.join(timeout=10)
+            if process.is_alive():
+                process.kill()
+        self.connections = []
+        self.processes = []
+
+class PoolClient:
+    """Send task batches to a running simulator pool service"""
+
+    def __init__(self, address, authkey=AUTHKEY):
+        self.connection = Client(parse_address(address) if isinstance(address, str) else address, authkey=authkey)
+
+    def map(self, tasks):
+        self.connection.send(list(tasks))
+        status, payload = self.connection.recv()
+        if status != "ok":
+            raise RuntimeError(payload)
+        return payload
+
+    def close(self):
+        try:
+            self.connection.send(None)
+        except (BrokenPipeError, OSError):
+            pass
+        self.connection.close()
+
+def serve(address, pool, authkey=AUTHKEY):
+    """Run task batches from clients on the pool's warm simulators, one client at a time"""
+    with Listener(parse_address(address), authkey=authkey) as listener:
+        print(f"✅ Simulator pool listening on {address} ({pool.workers} {pool.backend} workers)")
+        while True:
+            with listener.accept() as client:
+                while True:
+                    try:
+                        tasks = client.recv()
+                    except EOFError:
+                        break
+                    if tasks is None:
+                        break
+                    started = time.perf_counter()
+                    try:
+                        client.send(("ok", pool.map(tasks)))
+                    except Exception as e:
+                        client.send(("error", str(e)))
+                    print(f"📊 {len(tasks)} tasks in {time.perf_counter() - started:.2f}s")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Keep warm SUMO instances for candidate evaluation jobs")
+    parser.add_argument("--address", default="localhost:6100",
+                        help="host:port or Unix socket path to listen on")
+    parser.add_argument("--workers", type=int, help="warm simulators (default: CPU count)")
+    parser.add_argument("--backend", choices=[b for b in BACKENDS if b != "sumo-gui"], default="sumo",
+                        help="headless simulator backend")
+    parser.add_argument("--base-port", type=int, help="first TraCI port (default: pick free ones)")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    pool = SimulatorPool(args.workers, args.backend, args.base_port)
+    pool.start()
+    try:
+        serve(args.address, pool)
+    except KeyboardInterrupt:
+        print("\n⏹️ Simulator pool stopped")
+    finally:
+        pool.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+import numpy as np
+
+# Saturation flow per lane (veh/s), the HCM base of about 1800 veh/h
+SATURATION_FLOW = 0.5
+# Degree of saturation where Webster's random-delay term is capped
+MAX_SATURATION = 0.95
+
+class DelaySurrogate:
+    """Webster delay per TLS, calibrated online against simulated waits
+
+    Every TLS runs main and side green for the same green time g, each
+    followed by a yellow, so the cycle is C = 2 (g + yellow) and each
+    approach gets the green ratio l = g / C. For an arrival flow q per lane
+    and saturation flow s the degree of saturation is x = q / (l s) and
+    Webster's delay is
+
+        d = C (1 - l)**2 / (2 (1 - l min(x, 1))) + x**2 / (2 q (1 - x))
+
+    with x capped in the random term; once x passes 1 the HCM overflow
+    delay o = (x - 1) * horizon / 2 grows on top. Flows come from Little's
+    law on the observed averages (vehicles on an approach lane / time
+    spent on it). A per-TLS linear map wait = a d + b o + c, fitted by
+    recursive least squares with forgetting, turns the delays into the
+    collector's wait metric and absorbs what the isolated-intersection
+    model misses. predict() scores a whole (M, N) batch of candidates in
+    one NumPy pass; `samples` bounds how many plans are generated for it
+    to rank, and `calibration` how many are simulated before it is ready.
+    """
+
+    def __init__(self, tls_ids, lanes, lengths, speeds, yellow_time=3, horizon=300, top_k=8,
+                 saturation_flow=SATURATION_FLOW, forgetting=0.95, prior=10.0, flow_alpha=0.5,
+                 samples=256, calibration=None):
+        self.tls_ids = list(tls_ids)
+        n = len(self.tls_ids)
+        # Per TLS, averaged like the collector counts: once per controlled link
+        self.links = np.array([len(lanes[tls_id]) for tls_id in self.tls_ids], dtype=float)
+        self.travel = np.array([
+            np.mean([lengths[lane] / max(speeds[lane], 0.1) for lane in lanes[tls_id]]) if lanes[tls_id] else 0.0
+            for tls_id in self.tls_ids
+        ])
+        self.yellow_time = yellow_time
+        self.horizon = horizon
+        self.top_k = top_k
+        self.samples = samples
+        self.calibration = calibration or 2 * top_k
+        self.saturation_flow = saturation_flow
+        self.forgetting = forgetting
+        self.flow_alpha = flow_alpha
+        self.flows = None
+        self.theta = np.tile([1.0, 1.0, 0.0], (n, 1))
+        self.covariance = np.tile(np.eye(3) * prior, (n, 1, 1))
+        self.observations = 0
+
+    @classmethod
+    def from_collector(cls, collector, **kwargs):
+        """Build from a subscribed MetricsCollector's lanes, reading lane geometry once"""
+        if not collector.lanes:
+            collector.subscribe()
+        api = collector.api
+        lengths = {lane: api.lane.getLength(lane) for lane in collector.lanes}
+        speeds = {lane: api.lane.getMaxSpeed(lane) for lane in collector.lanes}
+        return cls(collector.tls_ids, collector.controlled_lanes, lengths, speeds, **kwargs)
+
+    @property
+    def ready(self):
+        return self.flows is not None
+
+    def green_matrix(self, candidates):
+        """(M, N) green times from a list of {tls_id: green} plans"""
+        return np.array([[plan[tls_id] for tls_id in self.tls_ids] for plan in candidates], dtype=float)
+
+    def delays(self, green):
+        """(Webster delay, overflow delay) in s/veh per TLS for green times of any shape (..., N)"""
+        green = np.asarray(green, dtype=float)
+        cycle = 2 * (green + self.yellow_time)
+        ratio = green / cycle
+        q = np.maximum(self.flows, 1e-6)
+        x = q / (ratio * self.saturation_flow)
+        capped = np.minimum(x, MAX_SATURATION)
+        uniform = cycle * (1 - ratio) ** 2 / (2 * (1 - ratio * np.minimum(x, 1.0)))
+        random = capped ** 2 / (2 * q * (1 - capped))
+        overflow = np.maximum(x - 1, 0) * self.horizon / 2
+        return uniform + random, overflow
+
+    def features(self, green):
+        """Regression inputs per TLS, shape green.shape + (3,)"""
+        webster, overflow = self.delays(green)
+        return np.stack([webster, overflow, np.ones_like(webster)], axis=-1)
+
+    def predict(self, green):
+        """Predicted wait per TLS, shape like green"""
+        return np.einsum("...ni,ni->...n", self.features(green), self.theta)
+
+    def shortlist(self, candidates, k=None):
+        """The k candidates with the lowest predicted total wait, best first"""
+        k = self.top_k if k is None else k
+        totals = self.predict(self.green_matrix(candidates)).sum(axis=-1)
+        order = np.argsort(totals, kind="stable")[:k]
+        return [candidates[i] for i in order]
+
+    def observe_flows(self, averages):
+        """Blend arrival flows per lane from one evaluation's averages into the estimate"""
+        vehicles = np.array([averages[tls_id]["vehicles"] for tls_id in self.tls_ids], dtype=float)
+        waits = np.array([averages[tls_id]["wait"] for tls_id in self.tls_ids], dtype=float)
+        per_lane = np.divide(vehicles, self.links, out=np.zeros_like(vehicles), where=self.links > 0)
+        flows = per_lane / np.maximum(self.travel + waits, 1.0)
+        if self.flows is None:
+            self.flows = flows
+        else:
+            self.flows = self.flows + self.flow_alpha * (flows - self.flows)
+
+    def update(self, results):
+        """Refine flows and the calibration from evaluator results (green_times, metrics)"""
+        scored = [result for result in results if not result.get("error") and result.get("metrics")]
+        for result in scored:
+            self.observe_flows(result["metrics"])
+        for result in scored:
+            green = np.array([result["green_times"][tls_id] for tls_id in self.tls_ids], dtype=float)
+            waits = np.array([result["metrics"][tls_id]["wait"] for tls_id in self.tls_ids], dtype=float)
+            features = self.features(green)
+            # Recursive least squares, one independent fit per TLS
+            gain_direction = np.einsum("nij,nj->ni", self.covariance, features)
+            denominator = self.forgetting + np.einsum("ni,ni->n", features, gain_direction)
+            gain = gain_direction / denominator[:, None]
+            error = waits - np.einsum("ni,ni->n", features, self.theta)
+            self.theta += gain * error[:, None]
+            self.covariance = (self.covariance - gain[:, :, None] * gain_direction[:, None, :]) / self.forgetting
+            self.observations += 1
+        return len(scored)
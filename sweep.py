@@ -0,0 +1,233 @@
+import argparse
+import asyncio
+import csv
+import itertools
+import json
+import os
+import signal
+import sys
+import tempfile
+import time
+from simulator_backend import BACKENDS
+
+SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cooperative_control.py")
+TABLE_COLUMNS = (
+    "run", "config", "scale", "seed", "solver", "status", "attempts", "port",
+    "seconds", "final_wait", "best_wait", "iterations", "green_times", "error",
+)
+
+def build_runs(configs, scales, seeds, solvers):
+    """One run per combination of config, demand scale, seed and solver"""
+    runs = []
+    for index, (config, scale, seed, solver) in enumerate(itertools.product(configs, scales, seeds, solvers)):
+        runs.append({"run": index, "config": config, "scale": scale, "seed": seed, "solver": solver})
+    return runs
+
+def kill_session(process):
+    """Kill a run and the SUMO process it started (same session/process group)"""
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except (AttributeError, ProcessLookupError):
+        process.kill()
+
+class SweepOrchestrator:
+    """Drive many headless cooperative_control.py runs concurrently with asyncio
+
+    At most max_parallel SUMO instances run at once, each on its own TraCI
+    port taken from a pool of max_parallel ports starting at base_port.
+    Runs that crash, time out or report an error are retried on another
+    port up to retries times. Cancelling (Ctrl+C / SIGTERM) kills the
+    running simulations and keeps the results collected so far.
+    """
+
+    def __init__(self, backend="sumo", max_parallel=None, retries=2, base_port=9100,
+                 timeout=None, observe_steps=0, extra_args=None, log_dir=None):
+        self.backend = backend
+        self.max_parallel = max_parallel or os.cpu_count() or 1
+        self.retries = retries
+        self.base_port = base_port
+        self.timeout = timeout
+        self.observe_steps = observe_steps
+        self.extra_args = list(extra_args or [])
+        self.log_dir = log_dir
+        self.results = {}
+
+    def command(self, run, port, results_file):
+        cmd = [
+            sys.executable, SCRIPT, "-c", run["config"],
+            "--backend", self.backend, "--port", str(port),
+            "--observe-steps", str(self.observe_steps),
+            "--results", results_file, "--quiet",
+        ]
+        if run["scale"] is not None:
+            cmd += ["--scale", str(run["scale"])]
+        if run["seed"] is not None:
+            cmd += ["--seed", str(run["seed"])]
+        if run["solver"]:
+            cmd += ["--solver", run["solver"]]
+        return cmd + self.extra_args
+
+    async def attempt(self, run, port):
+        """Run the simulation once; return its summary dict or raise RuntimeError"""
+        fd, results_file = tempfile.mkstemp(prefix=f"sweep_{run['run']}_", suffix=".json")
+        os.close(fd)
+        if self.log_dir:
+            log = open(os.path.join(self.log_dir, f"run_{run['run']:04d}.log"), 'ab')
+        else:
+            log = open(os.devnull, 'wb')
+        try:
+            process = await asyncio.create_subprocess_exec(
+                *self.command(run, port, results_file),
+                stdout=log, stderr=asyncio.subprocess.STDOUT,
+                start_new_session=True,  # Ctrl+C reaches the orchestrator only
+            )
+            try:
+                returncode = await asyncio.wait_for(process.wait(), self.timeout)
+            except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+                kill_session(process)
+                await process.wait()
+                if isinstance(e, asyncio.CancelledError):
+                    raise
+                raise RuntimeError(f"timed out after {self.timeout}s")
+
+            try:
+                with open(results_file) as f:
+                    summary = json.load(f)
+            except (OSError, ValueError):
+                raise RuntimeError(f"exited with code {returncode} without results")
+            if summary.get("error"):
+                raise RuntimeError(summary["error"])
+            if not summary.get("waits"):
+                raise RuntimeError(f"exited with code {returncode} before any iteration")
+            return summary
+        finally:
+            log.close()
+            os.remove(results_file)
+
+    async def execute(self, run, ports, semaphore):
+        row = {key: run.get(key) for key in ("run", "config", "scale", "seed", "solver")}
+        row.update(status="pending", attempts=0)
+        self.results[run["run"]] = row
+        async with semaphore:
+            started = time.perf_counter()
+            row["status"] = "running"
+            while True:
+                port = await ports.get()
+                row["attempts"] += 1
+                row["port"] = port
+                try:
+                    summary = await self.attempt(run, port)
+                except RuntimeError as e:
+                    row["error"] = str(e)
+                    if row["attempts"] > self.retries:
+                        row["status"] = "failed"
+                        break
+                    print(f"🔁 Run {run['run']} failed on port {port} ({e}), retrying...")
+                    continue
+                except asyncio.CancelledError:
+                    row["status"] = "cancelled"
+                    raise
+                finally:
+                    # Back of the queue, so a retry lands on a different port
+                    ports.put_nowait(port)
+                    row["seconds"] = time.perf_counter() - started
+
+                waits = summary["waits"]
+                row.update(
+                    status="ok", error=None, final_wait=waits[-1], best_wait=min(waits),
+                    iterations=summary.get("iterations"), green_times=summary.get("green_times"),
+                )
+                break
+        status = "✅" if row["status"] == "ok" else "❌"
+        print(f"{status} Run {run['run']} ({row['config']}, scale={row['scale']}, seed={row['seed']}, "
+              f"solver={row['solver']}): {row['status']} in {row['seconds']:.1f}s")
+        return row
+
+    async def run_all(self, runs):
+        """Run every scenario and return the result rows ordered by run index"""
+        semaphore = asyncio.Semaphore(self.max_parallel)
+        ports = asyncio.Queue()
+        for port in range(self.base_port, self.base_port + self.max_parallel):
+            ports.put_nowait(port)
+
+        tasks = [asyncio.ensure_future(self.execute(run, ports, semaphore)) for run in runs]
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, lambda: [task.cancel() for task in tasks])
+            except NotImplementedError:
+                pass  # Windows event loops have no signal handlers
+        try:
+            await asyncio.gather(*tasks, return_exceptions=True)
+        finally:
+            for sig in (signal.SIGINT, signal.SIGTERM):
+                try:
+                    loop.remove_signal_handler(sig)
+                except NotImplementedError:
+                    pass
+
+        for row in self.results.values():
+            if row["status"] in ("pending", "running"):
+                row["status"] = "cancelled"
+        return [self.results[index] for index in sorted(self.results)]
+
+def write_table(rows, output):
+    """Write result rows as CSV (.csv) or JSON (anything else)"""
+    if output.endswith(".csv"):
+        with open(output, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=TABLE_COLUMNS, extrasaction="ignore")
+            writer.writeheader()
+            for row in rows:
+                row = dict(row)
+                if row.get("green_times") is not None:
+                    row["green_times"] = json.dumps(row["green_times"])
+                writer.writerow(row)
+    else:
+        with open(output, 'w') as f:
+            json.dump(rows, f, indent=2)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run scenario sweeps of the cooperative controller")
+    parser.add_argument("--configs", nargs="+", default=["generated_config.sumocfg"], help="SUMO config files")
+    parser.add_argument("--scales", nargs="+", type=float, default=[0.5, 1.0, 1.5, 2.0],
+                        help="demand scale factors (SUMO --scale)")
+    parser.add_argument("--seeds", nargs="+", type=int, default=[42], help="SUMO random seeds")
+    parser.add_argument("--solvers", nargs="+", default=[""],
+                        help="solver methods; '' runs the pairwise A/B controller")
+    parser.add_argument("--backend", choices=[b for b in BACKENDS if b != "sumo-gui"], default="sumo",
+                        help="headless simulator backend")
+    parser.add_argument("--parallel", type=int, help="simultaneous simulations (default: CPU count)")
+    parser.add_argument("--retries", type=int, default=2, help="retries per crashed run")
+    parser.add_argument("--timeout", type=float, help="seconds before a run is killed")
+    parser.add_argument("--base-port", type=int, default=9100, help="first TraCI port of the pool")
+    parser.add_argument("--log-dir", help="keep each run's output in this directory")
+    parser.add_argument("--output", default="sweep_results.csv", help="result table (.csv or .json)")
+    args, extra = parser.parse_known_args(argv)
+    args.extra_args = extra  # Passed through to cooperative_control.py, e.g. --workers 4
+    return args
+
+def main(argv=None):
+    args = parse_args(argv)
+    if 'SUMO_HOME' not in os.environ:
+        print("❌ Please set SUMO_HOME environment variable")
+        return
+    if args.log_dir:
+        os.makedirs(args.log_dir, exist_ok=True)
+
+    runs = build_runs(args.configs, args.scales, args.seeds, args.solvers)
+    orchestrator = SweepOrchestrator(
+        backend=args.backend, max_parallel=args.parallel, retries=args.retries,
+        base_port=args.base_port, timeout=args.timeout, extra_args=args.extra_args,
+        log_dir=args.log_dir,
+    )
+    print(f"🚦 Sweeping {len(runs)} runs, {orchestrator.max_parallel} at a time")
+    started = time.perf_counter()
+    rows = asyncio.run(orchestrator.run_all(runs))
+
+    write_table(rows, args.output)
+    counts = {status: sum(row["status"] == status for row in rows) for status in ("ok", "failed", "cancelled")}
+    print(f"✅ {counts['ok']} ok, {counts['failed']} failed, {counts['cancelled']} cancelled "
+          f"in {time.perf_counter() - started:.0f}s; table written to {args.output}")
+
+if __name__ == "__main__":
+    main()
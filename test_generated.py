@@ -1,12 +1,9 @@
+import argparse
 import os
-import sys
-import traci
+from simulator_backend import add_backend_argument, add_sumo_tools_path, get_backend
 
-def test_generated_network():
-    if 'SUMO_HOME' in os.environ:
-        tools = os.path.join(os.environ['SUMO_HOME'], 'tools')
-        sys.path.append(tools)
-    else:
+def test_generated_network(backend_name=None):
+    if not add_sumo_tools_path():
         print("❌ Please set SUMO_HOME environment variable")
         return
 
@@ -19,32 +16,31 @@ def test_generated_network():
         print("❌ Config file not found!")
         return
 
-    sumoBinary = "sumo-gui"
+    backend = get_backend(backend_name)
     config_file = "generated_config.sumocfg"
 
     print("✅ Testing generated network...")
     
     try:
-        sumoCmd = [sumoBinary, "-c", config_file, "--start"]
-        traci.start(sumoCmd)
+        sim = backend.start(["-c", config_file])
         print("✅ SUMO started successfully!")
         
         # Check what we have
-        edges = traci.edge.getIDList()
+        edges = sim.edge.getIDList()
         print(f"✅ Found {len(edges)} edges: {edges}")
         
-        tls = traci.trafficlight.getIDList() 
+        tls = sim.trafficlight.getIDList() 
         print(f"✅ Traffic lights: {tls}")
         
         # Run simulation
         for step in range(200):
-            traci.simulationStep()
+            sim.simulationStep()
             if step % 20 == 0:
-                vehicles = traci.vehicle.getIDCount()
+                vehicles = sim.vehicle.getIDCount()
                 print(f"Step {step}: {vehicles} vehicles")
                 
         print("✅ Simulation completed!")
-        traci.close()
+        backend.close()
         
     except Exception as e:
         print(f"❌ Error: {e}")
@@ -52,4 +48,5 @@ def test_generated_network():
         traceback.print_exc()
 
 if __name__ == "__main__":
-    test_generated_network()
\ No newline at end of file
+    parser = add_backend_argument(argparse.ArgumentParser(description="Smoke-test the generated network"))
+    test_generated_network(parser.parse_args().backend)
\ No newline at end of file
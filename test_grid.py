@@ -0,0 +1,39 @@
+import argparse
+import json
+import os
+import time
+from simulator_backend import add_backend_argument, add_sumo_tools_path, get_backend
+
+def test_grid_candidates(backend_name="sumo", work_dir=".bench", limit=900):
+    """Parallel candidate control on a 3x3 grid of signals finishes within limit seconds"""
+    if not add_sumo_tools_path():
+        print("❌ Please set SUMO_HOME environment variable")
+        return
+
+    import cooperative_control
+    from benchmark import prepare_grid_scenario
+
+    # The batch stays bounded although 5 offsets for 9 signals make 5 ** 9 plans
+    controller = cooperative_control.CooperativeTrafficControl(get_backend(backend_name))
+    controller.green_times = {f"J{row}_{col}": 30 for row in range(3) for col in range(3)}
+    plans = controller.candidate_plans(max_candidates=32)
+    print(f"✅ {len(plans)} candidate plans for 9 signals")
+    assert len(plans) == 32, f"expected 32 candidate plans, got {len(plans)}"
+
+    _, config_file = prepare_grid_scenario(3, 3, work_dir)
+    results_file = os.path.join(work_dir, "grid_3x3_candidates.json")
+    started = time.perf_counter()
+    cooperative_control.main([
+        "-c", config_file, "--backend", backend_name, "--workers", "2", "--solver", "best_response",
+        "--observe-until", "steps", "--observe-steps", "10", "--quiet", "--results", results_file,
+    ])
+    seconds = time.perf_counter() - started
+    with open(results_file) as f:
+        summary = json.load(f)
+    assert "error" not in summary, f"3x3 grid run failed: {summary['error']}"
+    print(f"✅ 3x3 grid with parallel candidates: {summary['iterations']} iterations in {seconds:.1f}s")
+    assert seconds < limit, f"3x3 grid took {seconds:.1f}s, over {limit}s"
+
+if __name__ == "__main__":
+    parser = add_backend_argument(argparse.ArgumentParser(description="Check candidate control scales to a grid"))
+    test_grid_candidates(parser.parse_args().backend)
@@ -1,17 +1,14 @@
+import argparse
 import os
-import sys
-import traci
+from simulator_backend import add_backend_argument, add_sumo_tools_path, get_backend
 
-def test_simulation():
+def test_simulation(backend_name=None):
     # Set SUMO path
-    if 'SUMO_HOME' in os.environ:
-        tools = os.path.join(os.environ['SUMO_HOME'], 'tools')
-        sys.path.append(tools)
-    else:
+    if not add_sumo_tools_path():
         print("❌ Please set SUMO_HOME environment variable")
         return
 
-    sumoBinary = "sumo-gui"  # Try with GUI first to see errors
+    backend = get_backend(backend_name)
     config_file = "config.sumocfg"
     
     # Check if files exist
@@ -30,16 +27,15 @@ def test_simulation():
     print("✅ All files found")
     
     try:
-        sumoCmd = [sumoBinary, "-c", config_file, "--start"]
-        traci.start(sumoCmd)
+        sim = backend.start(["-c", config_file])
         print("✅ SUMO started successfully")
         
         # Try a few simulation steps
         for step in range(10):
-            traci.simulationStep()
+            sim.simulationStep()
             print(f"Step {step}: Simulation running...")
             
-        traci.close()
+        backend.close()
         print("✅ Simulation completed successfully")
         
     except Exception as e:
@@ -48,4 +44,5 @@ def test_simulation():
         traceback.print_exc()
 
 if __name__ == "__main__":
-    test_simulation()
\ No newline at end of file
+    parser = add_backend_argument(argparse.ArgumentParser(description="Smoke-test the bundled network"))
+    test_simulation(parser.parse_args().backend)
\ No newline at end of file
@@ -1,16 +1,14 @@
+import argparse
 import os
-import sys
-import traci
+from phase_builder import PhaseProgramBuilder
+from simulator_backend import add_backend_argument, add_sumo_tools_path, get_backend
 
-def test_simple_network():
-    if 'SUMO_HOME' in os.environ:
-        tools = os.path.join(os.environ['SUMO_HOME'], 'tools')
-        sys.path.append(tools)
-    else:
+def test_simple_network(backend_name=None):
+    if not add_sumo_tools_path():
         print("❌ Please set SUMO_HOME environment variable")
         return
 
-    sumoBinary = "sumo-gui"
+    backend = get_backend(backend_name)
     config_file = "simple_config.sumocfg"
     
     if not os.path.exists(config_file):
@@ -24,43 +22,39 @@ def test_simple_network():
     print("✅ Starting SUMO with simple network...")
     
     try:
-        sumoCmd = [sumoBinary, "-c", config_file, "--start"]
-        traci.start(sumoCmd)
+        sim = backend.start(["-c", config_file])
         print("✅ SUMO started successfully")
         
         # Check available edges
-        all_edges = traci.edge.getIDList()
+        all_edges = sim.edge.getIDList()
         print(f"✅ Available edges: {all_edges}")
         
         # Check traffic lights
-        tls_list = traci.trafficlight.getIDList()
+        tls_list = sim.trafficlight.getIDList()
         print(f"✅ Traffic lights: {tls_list}")
         
         # Set simple traffic light states
-        if "A" in tls_list:
-            traci.trafficlight.setRedYellowGreenState("A", "GGGrrrrrr")
-            print("✅ Set traffic light A")
-            
-        if "B" in tls_list:
-            traci.trafficlight.setRedYellowGreenState("B", "GGGrrrrrr") 
-            print("✅ Set traffic light B")
+        builder = PhaseProgramBuilder(sim)
+        for tls_id in tls_list:
+            sim.trafficlight.setRedYellowGreenState(tls_id, builder.get_states(tls_id)["main_green"])
+            print(f"✅ Set traffic light {tls_id}")
         
         # Run simulation
         step = 0
         max_steps = 300
         
         while step < max_steps:
-            traci.simulationStep()
+            sim.simulationStep()
             
             # Print progress
             if step % 30 == 0:
-                vehicles = traci.vehicle.getIDCount()
+                vehicles = sim.vehicle.getIDCount()
                 print(f"Step {step}: {vehicles} vehicles")
                 
             step += 1
 
         print("✅ Simulation completed successfully!")
-        traci.close()
+        backend.close()
         
     except Exception as e:
         print(f"❌ Error: {e}")
@@ -68,4 +62,5 @@ def test_simple_network():
         traceback.print_exc()
 
 if __name__ == "__main__":
-    test_simple_network()
\ No newline at end of file
+    parser = add_backend_argument(argparse.ArgumentParser(description="Smoke-test the simple network"))
+    test_simple_network(parser.parse_args().backend)
\ No newline at end of file
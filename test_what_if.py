@@ -0,0 +1,43 @@
+import argparse
+import os
+from simulator_backend import add_backend_argument, add_sumo_tools_path, get_backend
+
+def test_what_if_reproducible(backend_name="sumo"):
+    """The same plan scored twice from one snapshot gives the same total wait"""
+    if not add_sumo_tools_path():
+        print("❌ Please set SUMO_HOME environment variable")
+        return
+
+    config_file = "generated_config.sumocfg"
+    if not os.path.exists(config_file):
+        print(f"❌ Config file {config_file} not found! Run create_network.py first")
+        return
+
+    from cooperative_control import CooperativeTrafficControl
+    from what_if import WhatIfEngine
+
+    backend = get_backend(backend_name)
+    controller = CooperativeTrafficControl(backend)
+    controller.verbose = False
+    engine = WhatIfEngine(controller)
+    try:
+        backend.start(["-c", config_file, "--save-state.rng", "--no-step-log", "--no-warnings"])
+        plan = {"A": 20, "B": 20}
+        results = engine.evaluate([plan, {"A": 40, "B": 30}, plan])
+        first, second = results[0]["total_wait"], results[2]["total_wait"]
+        print(f"✅ Same plan from one snapshot: {first:.2f}s and {second:.2f}s")
+        assert first == second, f"what-if scores differ: {first} vs {second}"
+
+        # The live run continues from the snapshot exactly like a candidate
+        controller.green_times = dict(plan)
+        averages = controller.evaluate_plan(engine.evaluation_steps, engine.sample_interval)
+        live = sum(metrics["wait"] for metrics in averages.values())
+        print(f"✅ Live run with the same plan: {live:.2f}s")
+        assert live == first, f"live run differs from its candidate: {live} vs {first}"
+    finally:
+        engine.close()
+        backend.close()
+
+if __name__ == "__main__":
+    parser = add_backend_argument(argparse.ArgumentParser(description="Check what-if scoring is reproducible"))
+    test_what_if_reproducible(parser.parse_args().backend)
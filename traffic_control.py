@@ -1,13 +1,17 @@
+import argparse
 import os
-import sys
 import traci
+from network_index import NetworkIndex
+from phase_builder import PhaseProgramBuilder
+from regions import net_file_from_config
+from simulator_backend import add_backend_argument, add_sumo_tools_path, get_backend
 
-def check_edges_exist():
-    """Check if the edges we want to use actually exist"""
+def check_edges_exist(sim=traci, index=None):
+    """Check if the edges we want to use actually exist (and connect, with an index)"""
     try:
-        # Get all edge IDs from SUMO
-        all_edges = traci.edge.getIDList()
-        print("Available edges:", all_edges)
+        # Get all edge IDs from the network index, or from SUMO
+        all_edges = set(index.edges) if index is not None else set(sim.edge.getIDList())
+        print("Available edges:", sorted(all_edges))
         
         # Check our required edges
         required_edges = ["west_in", "A_to_B", "B_to_east2"]
@@ -16,73 +20,72 @@ def check_edges_exist():
                 print(f"✅ Edge '{edge}' exists")
             else:
                 print(f"❌ Edge '{edge}' NOT FOUND")
-                
+        
+        if index is not None:
+            problems = index.validate_route(required_edges)
+            for problem in problems:
+                print(f"❌ Route: {problem}")
+            return not problems
         return all(edge in all_edges for edge in required_edges)
     except Exception as e:
         print(f"Error checking edges: {e}")
         return False
 
-def set_tls_phases():
+def set_tls_phases(sim=traci, index=None):
     """Set simple traffic light phases"""
     try:
-        # For intersection A
-        traci.trafficlight.setRedYellowGreenState("A", "GGGrrrrrr")  # Main flow green
-        print("✅ Set traffic light A")
-        
-        # For intersection B  
-        traci.trafficlight.setRedYellowGreenState("B", "GGGrrrrrr")  # Main flow green
-        print("✅ Set traffic light B")
+        builder = PhaseProgramBuilder(sim, index=index)
+        for tls_id in sim.trafficlight.getIDList():
+            main_green = builder.get_states(tls_id)["main_green"]
+            sim.trafficlight.setRedYellowGreenState(tls_id, main_green)  # Main flow green
+            print(f"✅ Set traffic light {tls_id}")
         
     except Exception as e:
         print(f"Error setting TLS: {e}")
 
-def run_simulation():
-    if 'SUMO_HOME' in os.environ:
-        tools = os.path.join(os.environ['SUMO_HOME'], 'tools')
-        sys.path.append(tools)
-    else:
+def run_simulation(backend_name=None):
+    if not add_sumo_tools_path():
         print("❌ Please set SUMO_HOME environment variable")
         return
 
-    sumoBinary = "sumo-gui"
+    backend = get_backend(backend_name)
     config_file = "config.sumocfg"
     
     if not os.path.exists(config_file):
         print(f"❌ Config file {config_file} not found!")
         return
 
+    # Check our edges against the network index before starting SUMO
+    index = NetworkIndex.load(net_file_from_config(config_file))
+    if not check_edges_exist(index=index):
+        print("❌ Missing required edges!")
+        return
+    
     print("✅ Starting SUMO...")
     
     try:
-        sumoCmd = [sumoBinary, "-c", config_file, "--start"]
-        traci.start(sumoCmd)
+        sim = backend.start(["-c", config_file])
         print("✅ SUMO started successfully")
-        
-        # Check if our edges exist
-        if not check_edges_exist():
-            print("❌ Missing required edges!")
-            traci.close()
-            return
             
         # Set initial traffic light states
-        set_tls_phases()
+        set_tls_phases(sim, index)
         
         # Run simulation
         step = 0
         max_steps = 200
         
         while step < max_steps:
-            traci.simulationStep()
+            sim.simulationStep()
             
             # Print vehicle count every 20 steps
             if step % 20 == 0:
-                vehicle_count = traci.vehicle.getIDCount()
+                vehicle_count = sim.vehicle.getIDCount()
                 print(f"Step {step}: {vehicle_count} vehicles in network")
                 
             step += 1
 
         print("✅ Simulation completed successfully")
-        traci.close()
+        backend.close()
         
     except Exception as e:
         print(f"❌ Error during simulation: {e}")
@@ -90,4 +93,5 @@ def run_simulation():
         traceback.print_exc()
 
 if __name__ == "__main__":
-    run_simulation()
\ No newline at end of file
+    parser = add_backend_argument(argparse.ArgumentParser(description="Run the basic traffic simulation"))
+    run_simulation(parser.parse_args().backend)
\ No newline at end of file
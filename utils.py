@@ -0,0 +1,14 @@
+import hashlib
+
+def file_hash(path, chunk_size=1 << 20):
+    """SHA-256 of a file's contents, read in chunks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()[:16]
+
+def parse_time_of_day(text):
+    """'HH:MM' as seconds after midnight"""
+    hours, minutes = text.split(":")
+    return int(hours) * 3600 + int(minutes) * 60
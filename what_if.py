@@ -0,0 +1,84 @@
+import os
+import shutil
+import tempfile
+
+class WhatIfEngine:
+    """Score candidate plans from one saved state at the decision point
+
+    Every restore reloads the simulation (backend.reload), installs the
+    cooperative programs the state refers to and then loads the state;
+    rewinding a running simulation in place with loadState does not
+    reproduce it. Start SUMO with --save-state.rng so every candidate
+    also sees the same random number streams.
+    """
+
+    def __init__(self, controller, evaluation_steps=300, sample_interval=10, warmup_steps=100):
+        self.controller = controller
+        self.warmup_steps = warmup_steps
+        self.evaluation_steps = evaluation_steps
+        self.sample_interval = sample_interval
+        self.directory = tempfile.mkdtemp(prefix="whatif_")
+
+    def snapshot(self):
+        """Save the state at the current simulation time"""
+        sim = self.controller.sim
+        # States saved while flows are still starting up do not restore
+        # pending insertions reliably, so never snapshot before the warm-up
+        while sim.simulation.getTime() < self.warmup_steps:
+            sim.simulationStep()
+        # A state is only valid for its own decision point, so one file is kept
+        path = os.path.join(self.directory, "state.xml")
+        sim.simulation.saveState(path)
+        return path
+
+    def restore(self, path, green_times):
+        """Reload the simulation at the snapshot, running green_times"""
+        controller = self.controller
+        controller.backend.reload()
+        for tls_id, green_time in green_times.items():
+            controller.set_traffic_light_phases(tls_id, green_time)
+        controller.sim.simulation.loadState(path)
+        if controller.collector is not None:
+            controller.collector.subscribe()
+
+    def evaluate(self, candidates):
+        """Return one result dict per candidate; the simulation ends back at the snapshot"""
+        controller = self.controller
+        path = self.snapshot()
+        original = dict(controller.green_times)
+        verbose, sink = controller.verbose, controller.sink
+        # Candidate runs are hypothetical: keep them out of output and the sink
+        controller.verbose, controller.sink = False, None
+
+        results = []
+        try:
+            for index, green_times in enumerate(candidates):
+                self.restore(path, original)
+                controller.green_times = dict(green_times)
+                try:
+                    averages = controller.evaluate_plan(
+                        evaluation_steps=self.evaluation_steps,
+                        sample_interval=self.sample_interval,
+                    )
+                    error = None
+                except Exception as e:
+                    averages = {}
+                    error = str(e)
+                    print(f"❌ Candidate {index} failed: {error}")
+                results.append({
+                    "index": index,
+                    "green_times": dict(green_times),
+                    "metrics": averages,
+                    "total_wait": sum(m["wait"] for m in averages.values()) if averages else float('inf'),
+                    "steps": controller.last_evaluation["steps"] if not error else 0,
+                    "error": error,
+                })
+        finally:
+            self.restore(path, original)
+            controller.green_times = original
+            controller.verbose, controller.sink = verbose, sink
+
+        return results
+
+    def close(self):
+        shutil.rmtree(self.directory, ignore_errors=True)